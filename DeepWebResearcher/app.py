@@ -1,11 +1,24 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, current_app, request, send_from_directory
 from flask_cors import CORS
 import uuid
+import atexit
+import logging
+import logging.handlers
+import heapq
+import itertools
+import hashlib
+import re
 import threading
+import time
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
 import sqlite3
-import json
+import orjson
 import os
+import shutil
 from werkzeug.utils import secure_filename
 from draftagent import conduct_research_workflow, select_content_style
 from rag import get_rag_pipeline
@@ -21,172 +34,686 @@ if not os.getenv("HUGGINGFACEHUB_API_TOKEN"):
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+# Research workers log through a queue; a single listener thread does the blocking writes
+logger = logging.getLogger("research")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_log_queue = queue.SimpleQueue()
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(threadName)s] %(message)s"))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 # Database configuration
 DB_FILE = "research_database.sqlite"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+# Streamed listings read through their own connections, outside the pool, so slow clients
+# can't starve it; this caps how many may be open (each holds a read snapshot) at once
+STREAM_CONNECTIONS = int(os.getenv("STREAM_CONNECTIONS", "16"))
+STREAM_CONNECTION_WAIT_SECONDS = 5
+
+# Number of research runs kept in memory; older ones are reloaded from SQLite on demand
+MAX_RESEARCH_IN_MEMORY = int(os.getenv("MAX_RESEARCH_IN_MEMORY", "512"))
+# How long finished research runs are kept before cleanup removes them
+RESEARCH_TTL_SECONDS = 24 * 60 * 60
+# Statuses after which a research run no longer changes
+FINISHED_STATUSES = ("completed", "error")
+
+# Research runs execute on a bounded pool so bursts queue up instead of flooding the LLM APIs
+RESEARCH_WORKERS = int(os.getenv("RESEARCH_WORKERS", "4"))
+_research_pool = ThreadPoolExecutor(max_workers=RESEARCH_WORKERS, thread_name_prefix="research")
+
+# Tuning applied to every connection: WAL lets readers run alongside a writer,
+# and NORMAL sync only fsyncs at checkpoints instead of on every commit
+CONNECTION_PRAGMAS = '''
+PRAGMA foreign_keys = ON;
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+PRAGMA temp_store = MEMORY;
+PRAGMA mmap_size = 268435456;
+PRAGMA cache_size = -131072;
+'''
+
+# Current local time in the same ISO format as datetime.now().isoformat(), computed by
+# SQLite inside the statement rather than bound from Python on every write
+SQL_NOW = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')"
+
+# Fixed SQL text for "which of these PDF/draft ids exist": the ids are passed as one JSON
+# array so the statement stays in each connection's cache whatever the list length
+PDF_IDS_EXISTING_SQL = 'SELECT pdf_id FROM pdf_documents WHERE pdf_id IN (SELECT value FROM json_each(?))'
+PDF_STATUSES_SQL = 'SELECT pdf_id, status FROM pdf_documents WHERE pdf_id IN (SELECT value FROM json_each(?))'
+DRAFT_IDS_EXISTING_SQL = 'SELECT draft_id FROM drafts WHERE draft_id IN (SELECT value FROM json_each(?))'
+DRAFT_IDS_COUNT_SQL = 'SELECT COUNT(*) FROM drafts WHERE draft_id IN (SELECT value FROM json_each(?))'
+
+# Draft columns as returned by the library endpoints. The "[json]" aliases are decoded
+# by the converter registered below, so rows arrive with tags/references as lists;
+# the raw reference_list text isn't selected since references already carries it
+DRAFT_COLUMNS = '''
+    drafts.draft_id, drafts.title, COALESCE(drafts.tags, '[]') AS "tags [json]",
+    drafts.created_at, drafts.updated_at, drafts.research_id, drafts.query,
+    drafts.content_style, drafts.draft_content,
+    COALESCE(drafts.reference_list, '[]') AS "references [json]"
+'''
+sqlite3.register_converter("json", orjson.loads)
+
+# Playlist columns as returned by the library endpoints
+PLAYLIST_COLUMNS = 'playlist_id, name, description, created_at, updated_at, draft_count'
+
+# Columns returned by the PDF listing, in the order get_all_pdfs unpacks them
+PDF_LIST_COLUMNS = 'pdf_id, filename, title, description, file_path, uploaded_at, tags, metadata, status'
+
+# Pool of persistent connections shared by request handlers and background workers
+_db_pool = None
+_db_pool_lock = threading.Lock()
 
 # Upload folder for PDFs
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf'}
+_ALLOWED_SUFFIXES = tuple(f'.{extension}' for extension in ALLOWED_EXTENSIONS)
+# Number of PDF chunks embedded per request to the embeddings API
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH", "32"))
+# Uploaded PDFs are embedded off the request thread by this pool
+INDEX_WORKERS = int(os.getenv("INDEX_WORKERS", "2"))
+_index_executor = ThreadPoolExecutor(max_workers=INDEX_WORKERS, thread_name_prefix="pdf-index")
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-# Dictionary to store research results by ID (in-memory cache)
-research_results = {}
+# Behind nginx, let the proxy serve PDF downloads via X-Accel-Redirect;
+# XSENDFILE_PREFIX must map to an internal location aliased to UPLOAD_FOLDER
+TRUST_XSENDFILE = os.getenv("TRUST_XSENDFILE") == "1"
+XSENDFILE_PREFIX = os.getenv("XSENDFILE_PREFIX", "/protected/")
 
 # Dictionary to store PDF metadata and paths
 pdf_library = {}
 
+# orjson options for response bodies; non-string keys are allowed as jsonify does
+JSON_RESPONSE_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+def _json_response(data, status=200):
+    """Serialize a response body with orjson, passing its bytes straight through as the body"""
+    return current_app.response_class(
+        orjson.dumps(data, option=JSON_RESPONSE_OPTIONS), status=status, mimetype='application/json'
+    )
+
+def _streamed_json_response(head, key, rows, on_close):
+    """
+    Stream a JSON object made of the fields in head plus a key holding rows,
+    encoding one row at a time instead of building the whole list in memory.
+    on_close runs once the response is finished or abandoned.
+    """
+    def generate():
+        yield orjson.dumps(head, option=JSON_RESPONSE_OPTIONS)[:-1] + b',' + orjson.dumps(key) + b':['
+        separator = b''
+        for row in rows:
+            yield separator + orjson.dumps(dict(row), option=JSON_RESPONSE_OPTIONS)
+            separator = b','
+        yield b']}'
+
+    response = current_app.response_class(generate(), mimetype='application/json')
+    response.call_on_close(on_close)
+    return response
+
+def _invalid_draft_ids(cursor, draft_ids):
+    """Return the draft IDs that don't exist, counting first so the all-valid case fetches no rows"""
+    ids_json = orjson.dumps(draft_ids).decode()
+    cursor.execute(DRAFT_IDS_COUNT_SQL, (ids_json,))
+    if cursor.fetchone()[0] == len(set(draft_ids)):
+        return []
+
+    cursor.execute(DRAFT_IDS_EXISTING_SQL, (ids_json,))
+    valid_draft_ids = {row['draft_id'] for row in cursor.fetchall()}
+    return [draft_id for draft_id in draft_ids if draft_id not in valid_draft_ids]
+
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return filename.lower().endswith(_ALLOWED_SUFFIXES)
+
+# Bump SCHEMA_VERSION whenever SCHEMA_SQL or _ADDED_COLUMNS changes so init_db reapplies them
+SCHEMA_VERSION = 4
+
+SCHEMA_SQL = '''
+CREATE TABLE IF NOT EXISTS drafts (
+    draft_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    tags TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT,
+    research_id TEXT,
+    query TEXT,
+    content_style TEXT,
+    draft_content TEXT,
+    reference_list TEXT
+);
+
+CREATE TABLE IF NOT EXISTS playlists (
+    playlist_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT,
+    draft_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS playlist_drafts (
+    playlist_id TEXT,
+    draft_id TEXT,
+    added_at TEXT NOT NULL,
+    PRIMARY KEY (playlist_id, draft_id),
+    FOREIGN KEY (playlist_id) REFERENCES playlists(playlist_id) ON DELETE CASCADE,
+    FOREIGN KEY (draft_id) REFERENCES drafts(draft_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS pdf_documents (
+    pdf_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    title TEXT,
+    description TEXT,
+    file_path TEXT NOT NULL,
+    uploaded_at TEXT NOT NULL,
+    tags TEXT,
+    metadata TEXT,
+    status TEXT NOT NULL DEFAULT 'ready'
+);
+
+-- Research-PDF associations (already indexed by research_id through the primary key)
+CREATE TABLE IF NOT EXISTS research_pdfs (
+    research_id TEXT,
+    pdf_id TEXT,
+    PRIMARY KEY (research_id, pdf_id),
+    FOREIGN KEY (pdf_id) REFERENCES pdf_documents(pdf_id) ON DELETE CASCADE
+);
+
+-- Research runs, so results survive restarts and are shared between workers
+CREATE TABLE IF NOT EXISTS research_runs (
+    research_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload_json TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_pdf_uploaded_at ON pdf_documents(uploaded_at DESC);
+
+-- Library ordering and joins: drafts newest first, a playlist's drafts by added_at,
+-- and draft_id lookups for the playlist_drafts cascade when a draft is deleted
+CREATE INDEX IF NOT EXISTS idx_drafts_created ON drafts(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_playlists_created ON playlists(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_pd_playlist_added ON playlist_drafts(playlist_id, added_at DESC);
+CREATE INDEX IF NOT EXISTS idx_pd_draft ON playlist_drafts(draft_id);
+
+-- playlists.draft_count follows playlist_drafts, including rows removed by cascades
+CREATE TRIGGER IF NOT EXISTS trg_playlist_drafts_insert AFTER INSERT ON playlist_drafts
+BEGIN
+    UPDATE playlists SET draft_count = draft_count + 1 WHERE playlist_id = NEW.playlist_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_playlist_drafts_delete AFTER DELETE ON playlist_drafts
+BEGIN
+    UPDATE playlists SET draft_count = draft_count - 1 WHERE playlist_id = OLD.playlist_id;
+END;
+
+-- Recount when the schema is (re)applied so existing playlists start out correct
+UPDATE playlists SET draft_count = (
+    SELECT COUNT(*) FROM playlist_drafts WHERE playlist_drafts.playlist_id = playlists.playlist_id
+);
+
+-- One row per (draft, tag), kept in sync with drafts.tags by the triggers below,
+-- so tag filters are an index lookup instead of decoding every draft's JSON
+CREATE TABLE IF NOT EXISTS draft_tags (
+    draft_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (draft_id, tag),
+    FOREIGN KEY (draft_id) REFERENCES drafts(draft_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_draft_tags_tag ON draft_tags(tag);
+
+CREATE TRIGGER IF NOT EXISTS trg_drafts_tags_insert AFTER INSERT ON drafts
+BEGIN
+    INSERT OR IGNORE INTO draft_tags (draft_id, tag)
+    SELECT NEW.draft_id, value FROM json_each(NEW.tags) WHERE type = 'text';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_drafts_tags_update AFTER UPDATE OF tags ON drafts
+BEGIN
+    DELETE FROM draft_tags WHERE draft_id = NEW.draft_id;
+    INSERT OR IGNORE INTO draft_tags (draft_id, tag)
+    SELECT NEW.draft_id, value FROM json_each(NEW.tags) WHERE type = 'text';
+END;
+
+-- Backfill drafts saved before draft_tags existed
+INSERT OR IGNORE INTO draft_tags (draft_id, tag)
+SELECT drafts.draft_id, json_each.value
+FROM drafts, json_each(drafts.tags)
+WHERE json_valid(drafts.tags) AND json_each.type = 'text';
+'''
+
+# Columns added to tables after they first shipped, as (table, column, definition);
+# CREATE TABLE IF NOT EXISTS leaves older databases without them
+_ADDED_COLUMNS = [
+    ('pdf_documents', 'status', "TEXT NOT NULL DEFAULT 'ready'"),
+    ('playlists', 'draft_count', 'INTEGER NOT NULL DEFAULT 0'),
+]
 
 # Initialize database
 def init_db():
-    """Initialize the SQLite database with required tables"""
+    """Initialize the SQLite database, applying the schema only when its version is behind"""
     conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    conn.executescript(CONNECTION_PRAGMAS)
 
-    # Create tables if they don't exist
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS drafts (
-        draft_id TEXT PRIMARY KEY,
-        title TEXT NOT NULL,
-        tags TEXT,
-        created_at TEXT NOT NULL,
-        updated_at TEXT,
-        research_id TEXT,
-        query TEXT,
-        content_style TEXT,
-        draft_content TEXT,
-        reference_list TEXT
-    )
-    ''')
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS playlists (
-        playlist_id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        description TEXT,
-        created_at TEXT NOT NULL,
-        updated_at TEXT
-    )
-    ''')
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS playlist_drafts (
-        playlist_id TEXT,
-        draft_id TEXT,
-        added_at TEXT NOT NULL,
-        PRIMARY KEY (playlist_id, draft_id),
-        FOREIGN KEY (playlist_id) REFERENCES playlists(playlist_id) ON DELETE CASCADE,
-        FOREIGN KEY (draft_id) REFERENCES drafts(draft_id) ON DELETE CASCADE
-    )
-    ''')
-
-    # New table for PDF documents
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS pdf_documents (
-        pdf_id TEXT PRIMARY KEY,
-        filename TEXT NOT NULL,
-        title TEXT,
-        description TEXT,
-        file_path TEXT NOT NULL,
-        uploaded_at TEXT NOT NULL,
-        tags TEXT,
-        metadata TEXT
-    )
-    ''')
-
-    # New table for research-PDF associations
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS research_pdfs (
-        research_id TEXT,
-        pdf_id TEXT,
-        PRIMARY KEY (research_id, pdf_id),
-        FOREIGN KEY (pdf_id) REFERENCES pdf_documents(pdf_id) ON DELETE CASCADE
-    )
-    ''')
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version < SCHEMA_VERSION:
+        for table, column, definition in _ADDED_COLUMNS:
+            existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+            if existing and column not in existing:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
 
-    # Enable foreign key support
-    cursor.execute("PRAGMA foreign_keys = ON")
+        conn.executescript(SCHEMA_SQL)
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
 
-    conn.commit()
     conn.close()
 
     print(f"Database initialized: {DB_FILE}")
 
-def get_db_connection():
-    """Get a database connection with foreign key support enabled"""
-    conn = sqlite3.connect(DB_FILE)
+def _create_pooled_connection():
+    """Open a long-lived connection that can be handed between threads"""
+    conn = sqlite3.connect(
+        DB_FILE,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=256,
+        detect_types=sqlite3.PARSE_COLNAMES
+    )
     conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(CONNECTION_PRAGMAS)
     return conn
 
+def _get_db_pool():
+    """Create and fill the connection pool on first use"""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                pool = queue.Queue(maxsize=DB_POOL_SIZE)
+                for _ in range(DB_POOL_SIZE):
+                    pool.put(_create_pooled_connection())
+                _db_pool = pool
+    return _db_pool
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled database connection for the duration of a with-block"""
+    pool = _get_db_pool()
+    conn = pool.get()
+    try:
+        yield conn
+    finally:
+        # Never hand a connection back to the pool mid-transaction
+        if conn.in_transaction:
+            conn.rollback()
+        pool.put(conn)
+
+_stream_slots = threading.BoundedSemaphore(STREAM_CONNECTIONS)
+
+class StreamingBusy(Exception):
+    """Raised when every streaming connection is in use"""
+
+@contextmanager
+def streaming_connection():
+    """Open a dedicated connection for a streamed response, closed when the with-block exits"""
+    if not _stream_slots.acquire(timeout=STREAM_CONNECTION_WAIT_SECONDS):
+        raise StreamingBusy()
+    try:
+        conn = _create_pooled_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+    finally:
+        _stream_slots.release()
+
+# Striped per-run locks: updates to one run are atomic for readers holding the same
+# stripe, without serializing unrelated runs behind one global lock
+_LOCKS = [threading.Lock() for _ in range(64)]
+
+def _lock_for(research_id):
+    return _LOCKS[hash(research_id) & 63]
+
+class ResearchStore:
+    """
+    Bounded LRU cache of research runs backed by the research_runs table.
+    Runs still in progress in this process are never evicted.
+
+    Every write goes through to SQLite, so evicting an entry only drops it
+    from memory; evicted or pre-restart runs are reloaded on the next read.
+    Keys starting with an underscore (such as the run's Future) are
+    process-local and never persisted. Runs created by this process are
+    marked _owned and served from memory; other workers' runs are served
+    from memory once finished, and otherwise re-checked against the row's
+    updated_at on every read. The store's own lock only guards the
+    cache structure and expiry heap; a run's contents are guarded by its
+    _lock_for stripe. The cleanup thread waits on _expiry_ready, which is
+    notified whenever a finished run is pushed onto the heap.
+    """
+
+    def __init__(self, max_in_memory=MAX_RESEARCH_IN_MEMORY):
+        self.max_in_memory = max_in_memory
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._expiry_ready = threading.Condition(self._lock)
+        # (expires_ts, research_id) for runs finished by this process, earliest first
+        self._expiry_heap = []
+
+    def __contains__(self, research_id):
+        return self.get(research_id) is not None
+
+    def create(self, research_id, initial):
+        """Register a new research run and return its state"""
+        data = dict(initial, _owned=True)
+        with _lock_for(research_id):
+            with self._lock:
+                self._remember(research_id, data)
+            self._persist(research_id, data)
+        return data
+
+    def get(self, research_id):
+        """Return the state of a research run, or None if it is unknown"""
+        with self._lock:
+            data = self._cache.get(research_id)
+            if data is not None:
+                self._cache.move_to_end(research_id)
+
+        # Runs this process executes, and finished runs, only change here; any other run
+        # may be moving on in another worker, so check the database for a newer version
+        if data is not None and (data.get("_owned") or data.get("status") in FINISHED_STATUSES):
+            return data
+
+        row = self._load(research_id, data.get("_updated_at") if data is not None else None)
+        if row is None:
+            if data is not None:
+                with self._lock:
+                    self._cache.pop(research_id, None)
+            return None
+
+        updated_at, loaded = row
+        if loaded is None:
+            # Unchanged since it was cached
+            return data
+        loaded["_updated_at"] = updated_at
+
+        with self._lock:
+            # Another thread may have cached the same or a newer version while we were loading
+            cached = self._cache.get(research_id)
+            if cached is not None and (cached.get("_owned") or cached.get("_updated_at", "") >= loaded["_updated_at"]):
+                self._cache.move_to_end(research_id)
+                return cached
+            self._remember(research_id, loaded)
+        return loaded
+
+    def snapshot(self, research_id):
+        """Return a consistent shallow copy of a research run, or None if it is unknown"""
+        data = self.get(research_id)
+        if data is None:
+            return None
+
+        with _lock_for(research_id):
+            return dict(data)
+
+    def update(self, research_id, changes):
+        """Merge changes into a research run and write it through to the database"""
+        data = self.get(research_id)
+        if data is None:
+            raise KeyError(research_id)
+
+        with _lock_for(research_id):
+            data.update(changes)
+            if changes.get("status") in FINISHED_STATUSES:
+                data["_expires_ts"] = time.time() + RESEARCH_TTL_SECONDS
+                with self._expiry_ready:
+                    heapq.heappush(self._expiry_heap, (data["_expires_ts"], research_id))
+                    self._expiry_ready.notify()
+            if any(not key.startswith("_") for key in changes):
+                self._persist(research_id, data)
+        return data
+
+    def wait_for_expiry(self):
+        """Block until the earliest finished run has expired, sleeping indefinitely while none are pending"""
+        with self._expiry_ready:
+            while True:
+                if not self._expiry_heap:
+                    self._expiry_ready.wait()
+                    continue
+                delay = self._expiry_heap[0][0] - time.time()
+                if delay <= 0:
+                    return
+                self._expiry_ready.wait(timeout=delay)
+
+    def purge_expired(self):
+        """Drop the runs whose expiry time has passed, inspecting only those runs"""
+        now = time.time()
+        with self._lock:
+            expired = []
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                expired.append(heapq.heappop(self._expiry_heap)[1])
+        if not expired:
+            return []
+
+        # Never wait for a pooled connection while holding the store lock: request
+        # handlers hold a connection while they look runs up in the store
+        with db_connection() as conn:
+            conn.execute('''
+            DELETE FROM research_runs
+            WHERE research_id IN (SELECT value FROM json_each(?))
+                AND status IN ('completed', 'error')
+            ''', (orjson.dumps(expired).decode(),))
+
+        self._forget(expired)
+        return expired
+
+    def purge_finished(self, older_than):
+        """Drop completed or failed runs last updated before an ISO timestamp"""
+        with db_connection() as conn:
+            cursor = conn.execute('''
+            DELETE FROM research_runs
+            WHERE status IN ('completed', 'error') AND updated_at < ?
+            RETURNING research_id
+            ''', (older_than,))
+            purged = [row['research_id'] for row in cursor.fetchall()]
+
+        self._forget(purged)
+        return purged
+
+    def _forget(self, research_ids):
+        with self._lock:
+            for research_id in research_ids:
+                self._cache.pop(research_id, None)
+
+    def _remember(self, research_id, data):
+        self._cache[research_id] = data
+        self._cache.move_to_end(research_id)
+        excess = len(self._cache) - self.max_in_memory
+        if excess <= 0:
+            return
+
+        # Runs this process is still executing hold their Future and the live state the
+        # worker updates, so only finished runs and other workers' runs are evicted
+        evictable = list(itertools.islice(
+            (key for key, run in self._cache.items()
+             if not run.get("_owned") or run.get("status") in FINISHED_STATUSES),
+            excess
+        ))
+        for key in evictable:
+            del self._cache[key]
+        if len(evictable) < excess:
+            logger.warning(
+                "Research cache holds %d runs, over its limit of %d, because they are still in progress here",
+                len(self._cache), self.max_in_memory
+            )
+
+    def _load(self, research_id, known_updated_at=None):
+        """
+        Return (updated_at, payload) for a stored run, or None if it doesn't exist.
+        The payload is None when the row is still at known_updated_at, so an
+        unchanged run isn't read and decoded again.
+        """
+        with db_connection() as conn:
+            row = conn.execute(
+                '''
+                SELECT updated_at,
+                    CASE WHEN updated_at IS ? THEN NULL ELSE payload_json END AS payload_json
+                FROM research_runs WHERE research_id = ?
+                ''',
+                (known_updated_at, research_id)
+            ).fetchone()
+        if row is None:
+            return None
+        payload = row['payload_json']
+        return row['updated_at'], orjson.loads(payload) if payload is not None else None
+
+    def _persist(self, research_id, data):
+        now = datetime.now().isoformat()
+        data["_updated_at"] = now
+        with db_connection() as conn:
+            conn.execute('''
+            INSERT INTO research_runs (research_id, status, payload_json, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (research_id) DO UPDATE SET
+                status = excluded.status,
+                payload_json = excluded.payload_json,
+                updated_at = excluded.updated_at
+            ''', (
+                research_id,
+                data.get("status", "unknown"),
+                orjson.dumps({key: value for key, value in data.items() if not key.startswith("_")}).decode(),
+                data.get("created_at", now),
+                now
+            ))
+
+# Research runs by ID (in-memory LRU in front of the research_runs table)
+research_store = ResearchStore()
+
+def _normalize_query(query):
+    """Collapse case and whitespace so trivially different queries share a cache entry"""
+    return re.sub(r"\s+", " ", query.strip().lower())
+
+class RetrievalCache:
+    """
+    Thread-safe LRU of retrieval results. Callers key entries on the normalized query
+    but compute them from the original text, so the embedding still sees the user's
+    wording. clear() starts a new generation, and results computed before it are not
+    stored afterwards.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            generation = self._generation
+
+        value = compute()
+
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+_context_cache = RetrievalCache(max_size=1024)
+
+def _cached_context(query, pdf_ids_key):
+    """PDF context for a query, shared with queries that differ only in case or whitespace"""
+    return _context_cache.get_or_compute(
+        (_normalize_query(query), pdf_ids_key),
+        lambda: get_rag_pipeline().get_relevant_context(query)
+    )
+
+_query_cache = RetrievalCache(max_size=256)
+
+def _query_cached(query):
+    """Answer and source metadata for a /query-pdf question, shared with questions that differ only in case or whitespace"""
+    def compute():
+        result = get_rag_pipeline().query(query)
+        return result["answer"], tuple(doc["metadata"] for doc in result["documents"])
+
+    return _query_cache.get_or_compute(_normalize_query(query), compute)
+
+def _invalidate_pdf_caches():
+    """Forget cached retrieval results once the set of indexed PDFs changes"""
+    _context_cache.clear()
+    _query_cache.clear()
+
 def process_research_in_background(research_id, query, content_style, pdf_ids=None):
     """Background task to process research request with optional PDF context"""
     try:
-        print("\n" + "="*50)
-        print(f"PROCESSING RESEARCH: {research_id}")
-        print("="*50)
-        print(f"Query: {query}")
-        print(f"Content Style: {content_style}")
-        if pdf_ids:
-            print(f"Using PDFs: {pdf_ids}")
-        print("-"*50)
+        logger.info("Research %s started: query=%r style=%s pdfs=%s", research_id, query, content_style, pdf_ids or [])
 
         # Update status to processing
-        research_results[research_id]["status"] = "processing"
-        research_results[research_id]["processing_started"] = datetime.now().isoformat()
+        research_store.update(research_id, {
+            "status": "processing",
+            "processing_started": datetime.now().isoformat()
+        })
 
         # Get PDF context if PDF IDs are provided
         pdf_context = ""
         if pdf_ids and len(pdf_ids) > 0:
-            rag_pipeline = get_rag_pipeline()
+            try:
+                # Store PDF-research association in database
+                with db_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('BEGIN')
 
-            # Store PDF-research association in database
-            conn = get_db_connection()
-            cursor = conn.cursor()
+                    # Only link PDFs that still exist, in one query and one commit
+                    cursor.execute(PDF_IDS_EXISTING_SQL, (orjson.dumps(pdf_ids).decode(),))
+                    existing_ids = [row['pdf_id'] for row in cursor.fetchall()]
 
-            try:
-                for pdf_id in pdf_ids:
-                    # Get PDF file path from database
-                    cursor.execute('SELECT file_path FROM pdf_documents WHERE pdf_id = ?', (pdf_id,))
-                    pdf_row = cursor.fetchone()
-
-                    if pdf_row:
-                        # Add to research_pdfs table
-                        cursor.execute(
-                            'INSERT OR IGNORE INTO research_pdfs (research_id, pdf_id) VALUES (?, ?)',
-                            (research_id, pdf_id)
-                        )
+                    cursor.executemany(
+                        'INSERT OR IGNORE INTO research_pdfs (research_id, pdf_id) VALUES (?, ?)',
+                        [(research_id, pdf_id) for pdf_id in existing_ids]
+                    )
 
-                conn.commit()
+                    conn.commit()
 
                 # Get relevant context from the vector store
-                pdf_context = rag_pipeline.get_relevant_context(query)
-                print(f"Retrieved {len(pdf_context)} characters of PDF context")
+                pdf_context = _cached_context(query, tuple(sorted(pdf_ids)))
+                logger.info("Research %s retrieved %d characters of PDF context", research_id, len(pdf_context))
 
-            except Exception as e:
-                print(f"Error processing PDF context: {str(e)}")
-            finally:
-                conn.close()
+            except Exception:
+                logger.exception("Research %s failed to load PDF context", research_id)
 
         # Conduct the research with PDF context
         result = conduct_research_workflow(query, content_style, pdf_context)
 
         # Update the research results with the complete data
-        research_results[research_id].update(result)
-        research_results[research_id]["status"] = "completed"
-        research_results[research_id]["completed_at"] = datetime.now().isoformat()
+        research_store.update(research_id, {
+            **result,
+            "status": "completed",
+            "completed_at": datetime.now().isoformat()
+        })
 
-        print("\n" + "="*50)
-        print(f"RESEARCH COMPLETED: {research_id}")
-        print("="*50)
+        logger.info("Research %s completed", research_id)
     except Exception as e:
-        print(f"ERROR in research {research_id}: {str(e)}")
-        research_results[research_id]["status"] = "error"
-        research_results[research_id]["error"] = str(e)
-        research_results[research_id]["error_at"] = datetime.now().isoformat()
+        logger.exception("Research %s failed", research_id)
+        research_store.update(research_id, {
+            "status": "error",
+            "error": str(e),
+            "error_at": datetime.now().isoformat()
+        })
 
 @app.route('/research/start', methods=['POST'])
 def start_research():
@@ -199,48 +726,60 @@ def start_research():
         "style": 1,  # 1=blog post, 2=detailed report, 3=executive summary
         "pdf_ids": ["pdf-id-1", "pdf-id-2"]  # Optional
     }
+
+    Every PDF must have finished indexing (GET /pdfs/<id>/status reports "ready");
+    otherwise the request is rejected with 409 and the PDFs that aren't ready.
     """
     data = request.json
     if not data:
-        return jsonify({"error": "Request body must be JSON"}), 400
+        return _json_response({"error": "Request body must be JSON"}, 400)
 
     query = data.get('query')
     style_number = data.get('style', 1)
     pdf_ids = data.get('pdf_ids', [])
 
     if not query:
-        return jsonify({"error": "Missing required parameter: query"}), 400
+        return _json_response({"error": "Missing required parameter: query"}, 400)
 
     try:
         style_number = int(style_number)
         if style_number not in [1, 2, 3]:
-            return jsonify({"error": "Style number must be between 1 and 3"}), 400
+            return _json_response({"error": "Style number must be between 1 and 3"}, 400)
     except ValueError:
-        return jsonify({"error": "Style number must be an integer"}), 400
+        return _json_response({"error": "Style number must be an integer"}, 400)
 
     # Validate PDF IDs if provided
     if pdf_ids:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
 
-        try:
-            placeholders = ','.join(['?'] * len(pdf_ids))
-            cursor.execute(f'SELECT pdf_id FROM pdf_documents WHERE pdf_id IN ({placeholders})', pdf_ids)
-            valid_pdf_ids = [row['pdf_id'] for row in cursor.fetchall()]
-
-            invalid_pdfs = [pdf_id for pdf_id in pdf_ids if pdf_id not in valid_pdf_ids]
-            if invalid_pdfs:
-                return jsonify({
-                    "error": "Some PDF IDs are invalid",
-                    "invalid_pdfs": invalid_pdfs
-                }), 400
-
-            # Use only valid PDF IDs
-            pdf_ids = valid_pdf_ids
-        except Exception as e:
-            return jsonify({"error": f"Database error: {str(e)}"}), 500
-        finally:
-            conn.close()
+            try:
+                cursor.execute(PDF_STATUSES_SQL, (orjson.dumps(pdf_ids).decode(),))
+                pdf_statuses = {row['pdf_id']: row['status'] for row in cursor.fetchall()}
+
+                invalid_pdfs = [pdf_id for pdf_id in pdf_ids if pdf_id not in pdf_statuses]
+                if invalid_pdfs:
+                    return _json_response({
+                        "error": "Some PDF IDs are invalid",
+                        "invalid_pdfs": invalid_pdfs
+                    }, 400)
+
+                # Uploads are indexed in the background; research started before a PDF is
+                # ready would fetch its context without it, so make the client wait instead
+                unready_pdfs = {
+                    pdf_id: status for pdf_id, status in pdf_statuses.items() if status != 'ready'
+                }
+                if unready_pdfs:
+                    return _json_response({
+                        "error": "Some PDFs are not ready for research",
+                        "unready_pdfs": [pdf_id for pdf_id in pdf_ids if pdf_id in unready_pdfs],
+                        "pdf_statuses": unready_pdfs
+                    }, 409)
+
+                # Every ID is valid at this point; drop duplicates but keep request order
+                pdf_ids = list(dict.fromkeys(pdf_ids))
+            except Exception as e:
+                return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
     content_style = select_content_style(style_number)
 
@@ -248,7 +787,7 @@ def start_research():
     research_id = str(uuid.uuid4())
 
     # Initialize the research results with status information
-    research_results[research_id] = {
+    research = research_store.create(research_id, {
         "query": query,
         "content_style": content_style,
         "status": "queued",
@@ -261,23 +800,19 @@ def start_research():
         "fact_check_report": "",
         "draft_content": "",
         "pdf_ids": pdf_ids
-    }
+    })
 
-    # Start the research in a background thread
-    thread = threading.Thread(
-        target=process_research_in_background,
-        args=(research_id, query, content_style, pdf_ids)
-    )
-    thread.daemon = True
-    thread.start()
+    # Queue the research on the worker pool, keeping the Future for later cancellation
+    future = _research_pool.submit(process_research_in_background, research_id, query, content_style, pdf_ids)
+    research_store.update(research_id, {"_future": future})
 
     # Return the research ID and initial status immediately
-    return jsonify({
+    return _json_response({
         "status": "success",
         "message": "Research initiated successfully",
         "research_id": research_id,
         "research_status": "queued",
-        "created_at": research_results[research_id]["created_at"],
+        "created_at": research["created_at"],
         "pdf_count": len(pdf_ids) if pdf_ids else 0
     })
 
@@ -286,15 +821,40 @@ def get_research_results(research_id):
     """
     Endpoint to get all research results for a given research ID
     """
-    if research_id not in research_results:
-        return jsonify({"error": "Research ID not found"}), 404
+    result = research_store.snapshot(research_id)
+    if result is None:
+        return _json_response({"error": "Research ID not found"}, 404)
 
-    result = research_results[research_id]
     status = result.get("status", "unknown")
+    fields = request.args.get('fields')
+
+    # A run only changes when its status or one of its timestamps does, so pollers
+    # that send back the ETag get a bodyless 304 instead of the full payload
+    etag = hashlib.sha1(orjson.dumps([
+        fields,
+        status,
+        result.get("processing_started"),
+        result.get("completed_at"),
+        result.get("error_at")
+    ])).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    # Cheap polling path that never touches the research output or draft
+    if fields == 'status':
+        response = _json_response({
+            "research_id": research_id,
+            "status": status,
+            "completed_at": result.get("completed_at", "")
+        })
+        response.set_etag(etag)
+        return response
 
     # If research is not completed yet
     if status in ["queued", "processing"]:
-        return jsonify({
+        response = _json_response({
             "research_id": research_id,
             "status": status,
             "message": "Research is still in progress",
@@ -304,10 +864,12 @@ def get_research_results(research_id):
             "content_style": result.get("content_style", ""),
             "pdf_ids": result.get("pdf_ids", [])
         })
+        response.set_etag(etag)
+        return response
 
     # If there was an error
     if status == "error":
-        return jsonify({
+        response = _json_response({
             "research_id": research_id,
             "status": "error",
             "message": "An error occurred during research",
@@ -318,6 +880,8 @@ def get_research_results(research_id):
             "content_style": result.get("content_style", ""),
             "pdf_ids": result.get("pdf_ids", [])
         })
+        response.set_etag(etag)
+        return response
 
     # Format the response to include all components for completed research
     response = {
@@ -342,10 +906,44 @@ def get_research_results(research_id):
         "pdf_ids": result.get("pdf_ids", [])
     }
 
-    return jsonify(response)
+    response = _json_response(response)
+    response.set_etag(etag)
+    return response
 
 # PDF Management APIs
 
+def process_pdf_in_background(pdf_id, file_path, filename, title):
+    """Background task to embed an uploaded PDF and record the outcome"""
+    metadata = {"original_filename": filename}
+
+    try:
+        rag_pipeline = get_rag_pipeline()
+        if rag_pipeline:
+            metadata["chunk_count"] = rag_pipeline.process_pdf(
+                file_path,
+                {"pdf_id": pdf_id, "title": title},
+                batch_size=EMBED_BATCH_SIZE
+            )
+            status = "ready"
+            _invalidate_pdf_caches()
+        else:
+            # RAG pipeline not available, the file is stored but not searchable
+            metadata["note"] = "PDF content indexing is disabled. Configure MISTRAL_API_KEY, QDRANT_API_KEY, and QDRANT_URL to enable full PDF processing."
+            status = "not_indexed"
+    except Exception as e:
+        logger.exception("Indexing PDF %s failed", pdf_id)
+        metadata["error"] = str(e)
+        status = "failed"
+
+    try:
+        with db_connection() as conn:
+            conn.execute(
+                'UPDATE pdf_documents SET status = ?, metadata = ? WHERE pdf_id = ?',
+                (status, orjson.dumps(metadata).decode(), pdf_id)
+            )
+    except Exception:
+        logger.exception("Saving status for PDF %s failed", pdf_id)
+
 @app.route('/pdfs/upload', methods=['POST'])
 def upload_pdf():
     """
@@ -353,14 +951,14 @@ def upload_pdf():
     """
     # Check if the post request has the file part
     if 'file' not in request.files:
-        return jsonify({"error": "No file part"}), 400
+        return _json_response({"error": "No file part"}, 400)
 
     file = request.files['file']
 
     # If user does not select file, browser also
     # submit an empty part without filename
     if file.filename == '':
-        return jsonify({"error": "No selected file"}), 400
+        return _json_response({"error": "No selected file"}, 400)
 
     if file and allowed_file(file.filename):
         # Generate a unique ID for this PDF
@@ -373,8 +971,9 @@ def upload_pdf():
         unique_filename = f"{pdf_id}_{filename}"
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
 
-        # Save the file
-        file.save(file_path)
+        # Stream the upload to disk in fixed-size chunks to keep memory flat for large PDFs
+        with open(file_path, 'wb', buffering=0) as f:
+            shutil.copyfileobj(file.stream, f, length=64 * 1024)
 
         # Get metadata from form data
         title = request.form.get('title', filename)
@@ -382,91 +981,49 @@ def upload_pdf():
         tags = request.form.get('tags', '[]')  # JSON string of tags
 
         try:
-            tags_list = json.loads(tags)
+            tags_list = orjson.loads(tags)
             if not isinstance(tags_list, list):
                 tags_list = []
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             tags_list = []
 
-        # Current timestamp
-        now = datetime.now().isoformat()
-
         # Connect to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        try:
-            # Insert PDF info into database
-            cursor.execute('''
-            INSERT INTO pdf_documents (
-                pdf_id, filename, title, description, file_path, uploaded_at, tags, metadata
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                pdf_id,
-                filename,
-                title,
-                description,
-                file_path,
-                now,
-                json.dumps(tags_list),
-                json.dumps({"original_filename": filename})
-            ))
-
-            conn.commit()
+        with db_connection() as conn:
+            cursor = conn.cursor()
 
-            # Process the PDF with the RAG pipeline if available
             try:
-                rag_pipeline = get_rag_pipeline()
-                if rag_pipeline:
-                    chunk_count = rag_pipeline.process_pdf(file_path, {"pdf_id": pdf_id, "title": title})
-
-                    # Update metadata with chunk count
-                    cursor.execute('''
-                    UPDATE pdf_documents
-                    SET metadata = ?
-                    WHERE pdf_id = ?
-                    ''', (
-                        json.dumps({
-                            "original_filename": filename,
-                            "chunk_count": chunk_count
-                        }),
-                        pdf_id
-                    ))
-
-                    conn.commit()
+                # Insert PDF info into database
+                cursor.execute(f'''
+                INSERT INTO pdf_documents (
+                    pdf_id, filename, title, description, file_path, uploaded_at, tags, metadata, status
+                ) VALUES (?, ?, ?, ?, ?, {SQL_NOW}, ?, ?, 'processing')
+                ''', (
+                    pdf_id,
+                    filename,
+                    title,
+                    description,
+                    file_path,
+                    orjson.dumps(tags_list).decode(),
+                    orjson.dumps({"original_filename": filename}).decode()
+                ))
 
-                    return jsonify({
-                        "status": "success",
-                        "message": "PDF uploaded and processed successfully",
-                        "pdf_id": pdf_id,
-                        "title": title,
-                        "chunk_count": chunk_count
-                    })
-                else:
-                    # RAG pipeline not available, just upload the file
-                    return jsonify({
-                        "status": "success",
-                        "message": "PDF uploaded successfully (RAG processing disabled)",
-                        "pdf_id": pdf_id,
-                        "title": title,
-                        "note": "PDF content indexing is disabled. Configure MISTRAL_API_KEY, QDRANT_API_KEY, and QDRANT_URL to enable full PDF processing."
-                    })
+                conn.commit()
 
             except Exception as e:
-                return jsonify({
-                    "status": "partial_success",
-                    "message": f"PDF uploaded but processing failed: {str(e)}",
-                    "pdf_id": pdf_id,
-                    "title": title
-                })
+                conn.rollback()
+                return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
-        except Exception as e:
-            conn.rollback()
-            return jsonify({"error": f"Database error: {str(e)}"}), 500
-        finally:
-            conn.close()
+        # Embedding can take minutes for large PDFs, so index it in the background
+        _index_executor.submit(process_pdf_in_background, pdf_id, file_path, filename, title)
+
+        return _json_response({
+            "status": "processing",
+            "message": "PDF uploaded, indexing in progress",
+            "pdf_id": pdf_id,
+            "title": title
+        }, 202)
 
-    return jsonify({"error": "Invalid file type. Only PDF files are allowed."}), 400
+    return _json_response({"error": "Invalid file type. Only PDF files are allowed."}, 400)
 
 @app.route('/pdfs', methods=['GET'])
 def get_all_pdfs():
@@ -478,149 +1035,178 @@ def get_all_pdfs():
     """
     tag_filter = request.args.get('tag')
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        # Plain tuples are cheaper than sqlite3.Row for a listing built by hand
+        cursor.row_factory = None
 
-    try:
-        if tag_filter:
-            # SQLite doesn't have native JSON functions, so we'll filter in Python
-            cursor.execute('SELECT * FROM pdf_documents ORDER BY uploaded_at DESC')
-            rows = cursor.fetchall()
+        try:
+            if tag_filter:
+                # Match the tag with SQLite's JSON1 functions so only hits get decoded
+                cursor.execute(f'''
+                SELECT {PDF_LIST_COLUMNS} FROM pdf_documents
+                WHERE EXISTS (SELECT 1 FROM json_each(pdf_documents.tags) WHERE json_each.value = ?)
+                ORDER BY uploaded_at DESC
+                ''', (tag_filter,))
+            else:
+                # Get all PDFs
+                cursor.execute(f'SELECT {PDF_LIST_COLUMNS} FROM pdf_documents ORDER BY uploaded_at DESC')
+
+            pdfs_list = [
+                {
+                    "pdf_id": row[0],
+                    "filename": row[1],
+                    "title": row[2],
+                    "description": row[3],
+                    "file_path": row[4],
+                    "uploaded_at": row[5],
+                    "tags": orjson.loads(row[6]) if row[6] else [],
+                    "metadata": orjson.loads(row[7]) if row[7] else {},
+                    "status": row[8]
+                }
+                for row in cursor.fetchall()
+            ]
+
+            return _json_response({
+                "count": len(pdfs_list),
+                "pdfs": pdfs_list
+            })
+        except Exception as e:
+            return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
-            # Convert rows to dictionaries and filter by tag
-            pdfs_list = []
-            for row in rows:
-                pdf = dict(row)
-                tags = json.loads(pdf['tags'] or '[]')
-                pdf['tags'] = tags
-                pdf['metadata'] = json.loads(pdf['metadata'] or '{}')
+@app.route('/pdfs/<pdf_id>', methods=['GET'])
+def get_pdf_by_id(pdf_id):
+    """
+    Endpoint to get a specific PDF by ID
+    """
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-                if tag_filter in tags:
-                    pdfs_list.append(pdf)
-        else:
-            # Get all PDFs
-            cursor.execute('SELECT * FROM pdf_documents ORDER BY uploaded_at DESC')
-            rows = cursor.fetchall()
+        try:
+            cursor.execute('SELECT * FROM pdf_documents WHERE pdf_id = ?', (pdf_id,))
+            row = cursor.fetchone()
 
-            # Convert rows to dictionaries
-            pdfs_list = []
-            for row in rows:
-                pdf = dict(row)
-                pdf['tags'] = json.loads(pdf['tags'] or '[]')
-                pdf['metadata'] = json.loads(pdf['metadata'] or '{}')
-                pdfs_list.append(pdf)
+            if not row:
+                return _json_response({"error": "PDF ID not found"}, 404)
 
-        return jsonify({
-            "count": len(pdfs_list),
-            "pdfs": pdfs_list
-        })
-    except Exception as e:
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+            pdf = dict(row)
+            pdf['tags'] = orjson.loads(pdf['tags']) if pdf['tags'] else []
+            pdf['metadata'] = orjson.loads(pdf['metadata']) if pdf['metadata'] else {}
 
-@app.route('/pdfs/<pdf_id>', methods=['GET'])
-def get_pdf_by_id(pdf_id):
+            return _json_response(pdf)
+        except Exception as e:
+            return _json_response({"error": f"Database error: {str(e)}"}, 500)
+
+@app.route('/pdfs/<pdf_id>/status', methods=['GET'])
+def get_pdf_status(pdf_id):
     """
-    Endpoint to get a specific PDF by ID
+    Endpoint to poll the indexing status of an uploaded PDF
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-    try:
-        cursor.execute('SELECT * FROM pdf_documents WHERE pdf_id = ?', (pdf_id,))
-        row = cursor.fetchone()
+        try:
+            cursor.execute('SELECT status, metadata FROM pdf_documents WHERE pdf_id = ?', (pdf_id,))
+            row = cursor.fetchone()
 
-        if not row:
-            return jsonify({"error": "PDF ID not found"}), 404
+            if not row:
+                return _json_response({"error": "PDF not found"}, 404)
 
-        pdf = dict(row)
-        pdf['tags'] = json.loads(pdf['tags'] or '[]')
-        pdf['metadata'] = json.loads(pdf['metadata'] or '{}')
+            metadata = orjson.loads(row['metadata']) if row['metadata'] else {}
 
-        return jsonify(pdf)
-    except Exception as e:
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+            return _json_response({
+                "pdf_id": pdf_id,
+                "status": row['status'],
+                "chunk_count": metadata.get("chunk_count"),
+                "error": metadata.get("error")
+            })
+
+        except Exception as e:
+            return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
 @app.route('/pdfs/<pdf_id>/download', methods=['GET'])
 def download_pdf(pdf_id):
     """
     Endpoint to download a PDF file
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-    try:
-        cursor.execute('SELECT file_path, filename FROM pdf_documents WHERE pdf_id = ?', (pdf_id,))
-        row = cursor.fetchone()
+        try:
+            cursor.execute('SELECT file_path, filename FROM pdf_documents WHERE pdf_id = ?', (pdf_id,))
+            row = cursor.fetchone()
 
-        if not row:
-            return jsonify({"error": "PDF ID not found"}), 404
+            if not row:
+                return _json_response({"error": "PDF ID not found"}, 404)
 
-        file_path = row['file_path']
-        original_filename = row['filename']
+            file_path = row['file_path']
+            original_filename = row['filename']
 
-        # Check if file exists
-        if not os.path.exists(file_path):
-            return jsonify({"error": "PDF file not found on server"}), 404
+            # Check if file exists
+            if not os.path.exists(file_path):
+                return _json_response({"error": "PDF file not found on server"}, 404)
 
-        # Get directory and filename from path
-        directory = os.path.dirname(file_path)
-        filename = os.path.basename(file_path)
+            # Get directory and filename from path
+            directory = os.path.abspath(os.path.dirname(file_path))
+            filename = os.path.basename(file_path)
 
-        return send_from_directory(
-            directory,
-            filename,
-            as_attachment=True,
-            download_name=original_filename
-        )
-    except Exception as e:
-        return jsonify({"error": f"Error downloading PDF: {str(e)}"}), 500
-    finally:
-        conn.close()
+            if TRUST_XSENDFILE:
+                # The proxy streams the file itself, so no bytes pass through Python
+                return Response(status=200, mimetype='application/pdf', headers={
+                    'X-Accel-Redirect': f"{XSENDFILE_PREFIX.rstrip('/')}/{filename}",
+                    'Content-Disposition': f'attachment; filename="{original_filename}"'
+                })
+
+            # conditional=True adds Range and If-Modified-Since/ETag handling
+            return send_from_directory(
+                directory,
+                filename,
+                as_attachment=True,
+                download_name=original_filename,
+                conditional=True
+            )
+        except Exception as e:
+            return _json_response({"error": f"Error downloading PDF: {str(e)}"}, 500)
 
 @app.route('/pdfs/<pdf_id>', methods=['DELETE'])
 def delete_pdf(pdf_id):
     """
     Endpoint to delete a PDF from the library
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-    try:
-        # Get file path before deleting
-        cursor.execute('SELECT file_path FROM pdf_documents WHERE pdf_id = ?', (pdf_id,))
-        row = cursor.fetchone()
+        try:
+            # Get file path before deleting
+            cursor.execute('SELECT file_path FROM pdf_documents WHERE pdf_id = ?', (pdf_id,))
+            row = cursor.fetchone()
 
-        if not row:
-            return jsonify({"error": "PDF ID not found"}), 404
+            if not row:
+                return _json_response({"error": "PDF ID not found"}, 404)
 
-        file_path = row['file_path']
+            file_path = row['file_path']
 
-        # Begin transaction
-        conn.execute('BEGIN TRANSACTION')
+            # Begin transaction
+            conn.execute('BEGIN TRANSACTION')
 
-        # Delete from database
-        cursor.execute('DELETE FROM pdf_documents WHERE pdf_id = ?', (pdf_id,))
+            # Delete from database
+            cursor.execute('DELETE FROM pdf_documents WHERE pdf_id = ?', (pdf_id,))
 
-        # Commit transaction
-        conn.commit()
+            # Commit transaction
+            conn.commit()
+            _invalidate_pdf_caches()
 
-        # Delete file from disk
-        if os.path.exists(file_path):
-            os.remove(file_path)
+            # Delete file from disk
+            if os.path.exists(file_path):
+                os.remove(file_path)
 
-        return jsonify({
-            "status": "success",
-            "message": "PDF deleted successfully"
-        })
-    except Exception as e:
-        conn.rollback()
-        return jsonify({"error": f"Error deleting PDF: {str(e)}"}), 500
-    finally:
-        conn.close()
+            return _json_response({
+                "status": "success",
+                "message": "PDF deleted successfully"
+            })
+        except Exception as e:
+            conn.rollback()
+            return _json_response({"error": f"Error deleting PDF: {str(e)}"}, 500)
 
 @app.route('/pdfs/<pdf_id>', methods=['PUT'])
 def update_pdf_metadata(pdf_id):
@@ -636,104 +1222,107 @@ def update_pdf_metadata(pdf_id):
     """
     data = request.json
     if not data:
-        return jsonify({"error": "Request body must be JSON"}), 400
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
+        return _json_response({"error": "Request body must be JSON"}, 400)
 
-    try:
-        # Check if PDF exists
-        cursor.execute('SELECT pdf_id FROM pdf_documents WHERE pdf_id = ?', (pdf_id,))
-        if not cursor.fetchone():
-            return jsonify({"error": "PDF ID not found"}), 404
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-        # Begin transaction
-        conn.execute('BEGIN TRANSACTION')
+        try:
+            # Take the write lock up front so the row we read is the row we update
+            conn.execute('BEGIN IMMEDIATE')
 
-        # Update fields
-        updates = []
-        params = []
+            # Check if PDF exists, keeping its current values for the response
+            cursor.execute('SELECT * FROM pdf_documents WHERE pdf_id = ?', (pdf_id,))
+            row = cursor.fetchone()
+            if not row:
+                conn.rollback()
+                return _json_response({"error": "PDF ID not found"}, 404)
 
-        if 'title' in data:
-            updates.append("title = ?")
-            params.append(data['title'])
+            # Update fields
+            updates = []
+            params = []
 
-        if 'description' in data:
-            updates.append("description = ?")
-            params.append(data['description'])
+            if 'title' in data:
+                updates.append("title = ?")
+                params.append(data['title'])
 
-        if 'tags' in data:
-            updates.append("tags = ?")
-            params.append(json.dumps(data['tags']))
+            if 'description' in data:
+                updates.append("description = ?")
+                params.append(data['description'])
 
-        # Add pdf_id to params
-        params.append(pdf_id)
+            if 'tags' in data:
+                updates.append("tags = ?")
+                params.append(orjson.dumps(data['tags']).decode())
 
-        # Execute update
-        if updates:
-            query = f"UPDATE pdf_documents SET {', '.join(updates)} WHERE pdf_id = ?"
-            cursor.execute(query, params)
+            # Add pdf_id to params
+            params.append(pdf_id)
 
-        # Commit transaction
-        conn.commit()
+            # Execute update
+            if updates:
+                query = f"UPDATE pdf_documents SET {', '.join(updates)} WHERE pdf_id = ?"
+                cursor.execute(query, params)
 
-        # Get updated PDF
-        cursor.execute('SELECT * FROM pdf_documents WHERE pdf_id = ?', (pdf_id,))
-        updated_pdf = dict(cursor.fetchone())
-        updated_pdf['tags'] = json.loads(updated_pdf['tags'] or '[]')
-        updated_pdf['metadata'] = json.loads(updated_pdf['metadata'] or '{}')
+            # Commit transaction
+            conn.commit()
 
-        return jsonify({
-            "status": "success",
-            "message": "PDF metadata updated successfully",
-            "pdf": updated_pdf
-        })
-    except Exception as e:
-        conn.rollback()
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+            # Build the updated PDF from the row we read and the values just written
+            updated_pdf = dict(row)
+            for field in ('title', 'description'):
+                if field in data:
+                    updated_pdf[field] = data[field]
+            if 'tags' in data:
+                updated_pdf['tags'] = data['tags']
+            else:
+                updated_pdf['tags'] = orjson.loads(row['tags']) if row['tags'] else []
+            updated_pdf['metadata'] = orjson.loads(row['metadata']) if row['metadata'] else {}
+
+            return _json_response({
+                "status": "success",
+                "message": "PDF metadata updated successfully",
+                "pdf": updated_pdf
+            })
+        except Exception as e:
+            conn.rollback()
+            return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
 @app.route('/research/<research_id>/pdfs', methods=['GET'])
 def get_research_pdfs(research_id):
     """
     Endpoint to get all PDFs associated with a research
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    # Check if research exists before borrowing a connection; the lookup may need one of its own
+    if research_id not in research_store:
+        return _json_response({"error": "Research ID not found"}, 404)
 
-    try:
-        # Check if research exists
-        if research_id not in research_results:
-            return jsonify({"error": "Research ID not found"}), 404
-
-        # Get PDFs associated with the research
-        cursor.execute('''
-        SELECT p.* FROM pdf_documents p
-        JOIN research_pdfs rp ON p.pdf_id = rp.pdf_id
-        WHERE rp.research_id = ?
-        ORDER BY p.uploaded_at DESC
-        ''', (research_id,))
-
-        rows = cursor.fetchall()
-
-        # Convert rows to dictionaries
-        pdfs_list = []
-        for row in rows:
-            pdf = dict(row)
-            pdf['tags'] = json.loads(pdf['tags'] or '[]')
-            pdf['metadata'] = json.loads(pdf['metadata'] or '{}')
-            pdfs_list.append(pdf)
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-        return jsonify({
-            "research_id": research_id,
-            "count": len(pdfs_list),
-            "pdfs": pdfs_list
-        })
-    except Exception as e:
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+        try:
+            # Get PDFs associated with the research
+            cursor.execute('''
+            SELECT p.* FROM pdf_documents p
+            JOIN research_pdfs rp ON p.pdf_id = rp.pdf_id
+            WHERE rp.research_id = ?
+            ORDER BY p.uploaded_at DESC
+            ''', (research_id,))
+
+            rows = cursor.fetchall()
+
+            # Convert rows to dictionaries
+            pdfs_list = []
+            for row in rows:
+                pdf = dict(row)
+                pdf['tags'] = orjson.loads(pdf['tags']) if pdf['tags'] else []
+                pdf['metadata'] = orjson.loads(pdf['metadata']) if pdf['metadata'] else {}
+                pdfs_list.append(pdf)
+
+            return _json_response({
+                "research_id": research_id,
+                "count": len(pdfs_list),
+                "pdfs": pdfs_list
+            })
+        except Exception as e:
+            return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
 @app.route('/query-pdf', methods=['POST'])
 def query_pdf_directly():
@@ -748,29 +1337,27 @@ def query_pdf_directly():
     """
     data = request.json
     if not data:
-        return jsonify({"error": "Request body must be JSON"}), 400
+        return _json_response({"error": "Request body must be JSON"}, 400)
 
     query = data.get('query')
     pdf_ids = data.get('pdf_ids', [])
 
     if not query:
-        return jsonify({"error": "Missing required parameter: query"}), 400
+        return _json_response({"error": "Missing required parameter: query"}, 400)
 
     try:
-        rag_pipeline = get_rag_pipeline()
-
         # If specific PDF IDs are provided, we could filter results
         # but for now we'll just query the entire vector store
-        result = rag_pipeline.query(query)
+        answer, sources = _query_cached(query)
 
-        return jsonify({
+        return _json_response({
             "status": "success",
             "query": query,
-            "answer": result["answer"],
-            "sources": [doc["metadata"] for doc in result["documents"]]
+            "answer": answer,
+            "sources": list(sources)
         })
     except Exception as e:
-        return jsonify({"error": f"Error querying PDFs: {str(e)}"}), 500
+        return _json_response({"error": f"Error querying PDFs: {str(e)}"}, 500)
 
 # Library management APIs with SQLite
 
@@ -789,7 +1376,7 @@ def save_draft_to_library():
     """
     data = request.json
     if not data:
-        return jsonify({"error": "Request body must be JSON"}), 400
+        return _json_response({"error": "Request body must be JSON"}, 400)
 
     research_id = data.get('research_id')
     title = data.get('title')
@@ -797,63 +1384,56 @@ def save_draft_to_library():
     custom_content = data.get('content')  # Get optional content
 
     if not research_id:
-        return jsonify({"error": "Missing required parameter: research_id"}), 400
+        return _json_response({"error": "Missing required parameter: research_id"}, 400)
     if not title:
-        return jsonify({"error": "Missing required parameter: title"}), 400
+        return _json_response({"error": "Missing required parameter: title"}, 400)
 
     # Check if research exists and is completed
-    if research_id not in research_results:
-        return jsonify({"error": "Research ID not found"}), 404
+    result = research_store.snapshot(research_id)
+    if result is None:
+        return _json_response({"error": "Research ID not found"}, 404)
 
-    result = research_results[research_id]
     if result.get("status") != "completed":
-        return jsonify({"error": "Research is not completed yet"}), 400
+        return _json_response({"error": "Research is not completed yet"}, 400)
 
     # Generate a unique ID for this draft
     draft_id = str(uuid.uuid4())
 
-    # Current timestamp
-    now = datetime.now().isoformat()
-
     # Connect to database
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-    try:
-        # Use custom content if provided, otherwise use the original research content
-        draft_content = custom_content if custom_content is not None else result.get("draft_content", "")
-
-        # Insert draft into database
-        cursor.execute('''
-        INSERT INTO drafts (
-            draft_id, title, tags, created_at, updated_at, research_id,
-            query, content_style, draft_content, reference_list
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            draft_id,
-            title,
-            json.dumps(tags),
-            now,
-            now,
-            research_id,
-            result.get("query", ""),
-            result.get("content_style", ""),
-            draft_content,
-            json.dumps(result.get("references", []))
-        ))
+        try:
+            # Use custom content if provided, otherwise use the original research content
+            draft_content = custom_content if custom_content is not None else result.get("draft_content", "")
+
+            # Insert draft into database
+            cursor.execute(f'''
+            INSERT INTO drafts (
+                draft_id, title, tags, created_at, updated_at, research_id,
+                query, content_style, draft_content, reference_list
+            ) VALUES (?, ?, ?, {SQL_NOW}, {SQL_NOW}, ?, ?, ?, ?, ?)
+            ''', (
+                draft_id,
+                title,
+                orjson.dumps(tags).decode(),
+                research_id,
+                result.get("query", ""),
+                result.get("content_style", ""),
+                draft_content,
+                orjson.dumps(result.get("references", [])).decode()
+            ))
 
-        conn.commit()
+            conn.commit()
 
-        return jsonify({
-            "status": "success",
-            "message": "Draft saved to library successfully",
-            "draft_id": draft_id
-        })
-    except Exception as e:
-        conn.rollback()
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+            return _json_response({
+                "status": "success",
+                "message": "Draft saved to library successfully",
+                "draft_id": draft_id
+            })
+        except Exception as e:
+            conn.rollback()
+            return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
 @app.route('/library/save-copy', methods=['POST'])
 def save_draft_copy():
@@ -871,7 +1451,7 @@ def save_draft_copy():
     """
     data = request.json
     if not data:
-        return jsonify({"error": "Request body must be JSON"}), 400
+        return _json_response({"error": "Request body must be JSON"}, 400)
 
     title = data.get('title')
     content = data.get('content', '')
@@ -880,48 +1460,41 @@ def save_draft_copy():
     references = data.get('references', [])
 
     if not title:
-        return jsonify({"error": "Missing required parameter: title"}), 400
+        return _json_response({"error": "Missing required parameter: title"}, 400)
 
     # Generate a unique ID for this draft
     draft_id = str(uuid.uuid4())
 
-    # Current timestamp
-    now = datetime.now().isoformat()
-
     # Connect to database
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-    try:
-        # Insert draft into database
-        cursor.execute('''
-        INSERT INTO drafts (
-            draft_id, title, tags, created_at, updated_at,
-            content_style, draft_content, reference_list
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            draft_id,
-            title,
-            json.dumps(tags),
-            now,
-            now,
-            content_style,
-            content,
-            json.dumps(references)
-        ))
+        try:
+            # Insert draft into database
+            cursor.execute(f'''
+            INSERT INTO drafts (
+                draft_id, title, tags, created_at, updated_at,
+                content_style, draft_content, reference_list
+            ) VALUES (?, ?, ?, {SQL_NOW}, {SQL_NOW}, ?, ?, ?)
+            ''', (
+                draft_id,
+                title,
+                orjson.dumps(tags).decode(),
+                content_style,
+                content,
+                orjson.dumps(references).decode()
+            ))
 
-        conn.commit()
+            conn.commit()
 
-        return jsonify({
-            "status": "success",
-            "message": "Draft copy saved to library successfully",
-            "draft_id": draft_id
-        })
-    except Exception as e:
-        conn.rollback()
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+            return _json_response({
+                "status": "success",
+                "message": "Draft copy saved to library successfully",
+                "draft_id": draft_id
+            })
+        except Exception as e:
+            conn.rollback()
+            return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
 @app.route('/library/drafts', methods=['GET'])
 def get_all_drafts():
@@ -933,100 +1506,78 @@ def get_all_drafts():
     """
     tag_filter = request.args.get('tag')
 
-    conn = get_db_connection()
+    # The connection stays open until the streamed response is closed
+    resources = ExitStack()
+    try:
+        conn = resources.enter_context(streaming_connection())
+    except StreamingBusy:
+        return _json_response({"error": "Server is busy, please retry shortly"}, 503)
     cursor = conn.cursor()
 
     try:
-        if tag_filter:
-            # SQLite doesn't have native JSON functions, so we'll filter in Python
-            cursor.execute('SELECT * FROM drafts ORDER BY created_at DESC')
-            rows = cursor.fetchall()
-
-            # Convert rows to dictionaries and filter by tag
-            drafts_list = []
-            for row in rows:
-                draft = dict(row)
-                tags = json.loads(draft['tags'] or '[]')
-                draft['tags'] = tags
-                draft['references'] = json.loads(draft['reference_list'] or '[]')
+        # Read the count and the rows from one snapshot so they agree
+        conn.execute('BEGIN')
 
-                if tag_filter in tags:
-                    drafts_list.append(draft)
+        if tag_filter:
+            # Look the tag up in draft_tags so only matching drafts are read and decoded
+            cursor.execute('SELECT COUNT(*) FROM draft_tags WHERE tag = ?', (tag_filter,))
+            count = cursor.fetchone()[0]
+            cursor.execute(f'''
+            SELECT {DRAFT_COLUMNS} FROM drafts
+            JOIN draft_tags ON draft_tags.draft_id = drafts.draft_id
+            WHERE draft_tags.tag = ?
+            ORDER BY drafts.created_at DESC
+            ''', (tag_filter,))
         else:
             # Get all drafts
-            cursor.execute('SELECT * FROM drafts ORDER BY created_at DESC')
-            rows = cursor.fetchall()
-
-            # Convert rows to dictionaries
-            drafts_list = []
-            for row in rows:
-                draft = dict(row)
-                draft['tags'] = json.loads(draft['tags'] or '[]')
-                draft['references'] = json.loads(draft['reference_list'] or '[]')
-                drafts_list.append(draft)
-
-        return jsonify({
-            "count": len(drafts_list),
-            "drafts": drafts_list
-        })
+            cursor.execute('SELECT COUNT(*) FROM drafts')
+            count = cursor.fetchone()[0]
+            cursor.execute(f'SELECT {DRAFT_COLUMNS} FROM drafts ORDER BY created_at DESC')
     except Exception as e:
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+        resources.close()
+        return _json_response({"error": f"Database error: {str(e)}"}, 500)
+
+    return _streamed_json_response({"count": count}, "drafts", cursor, resources.close)
 
 @app.route('/library/drafts/<draft_id>', methods=['GET'])
 def get_draft_by_id(draft_id):
     """
     Endpoint to get a specific draft by ID
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    try:
-        cursor.execute('SELECT * FROM drafts WHERE draft_id = ?', (draft_id,))
-        row = cursor.fetchone()
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-        if not row:
-            return jsonify({"error": "Draft ID not found"}), 404
+        try:
+            cursor.execute(f'SELECT {DRAFT_COLUMNS} FROM drafts WHERE draft_id = ?', (draft_id,))
+            row = cursor.fetchone()
 
-        draft = dict(row)
-        draft['tags'] = json.loads(draft['tags'] or '[]')
-        draft['references'] = json.loads(draft['reference_list'] or '[]')
+            if not row:
+                return _json_response({"error": "Draft ID not found"}, 404)
 
-        return jsonify(draft)
-    except Exception as e:
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+            return _json_response(dict(row))
+        except Exception as e:
+            return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
 @app.route('/library/playlists', methods=['GET'])
 def get_all_playlists():
     """
     Endpoint to get all playlists
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-    try:
-        # Get all playlists
-        cursor.execute('''
-        SELECT p.*, COUNT(pd.draft_id) as draft_count
-        FROM playlists p
-        LEFT JOIN playlist_drafts pd ON p.playlist_id = pd.playlist_id
-        GROUP BY p.playlist_id
-        ORDER BY p.created_at DESC
-        ''')
-
-        playlists_list = [dict(row) for row in cursor.fetchall()]
-
-        return jsonify({
-            "count": len(playlists_list),
-            "playlists": playlists_list
-        })
-    except Exception as e:
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+        try:
+            # Get all playlists (draft_count is kept up to date by triggers)
+            cursor.execute(f'SELECT {PLAYLIST_COLUMNS} FROM playlists ORDER BY created_at DESC')
+
+            playlists_list = [dict(row) for row in cursor.fetchall()]
+
+            return _json_response({
+                "count": len(playlists_list),
+                "playlists": playlists_list
+            })
+        except Exception as e:
+            return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
 @app.route('/library/playlists', methods=['POST'])
 def create_playlist():
@@ -1042,116 +1593,99 @@ def create_playlist():
     """
     data = request.json
     if not data:
-        return jsonify({"error": "Request body must be JSON"}), 400
+        return _json_response({"error": "Request body must be JSON"}, 400)
 
     name = data.get('name')
     description = data.get('description', '')
     draft_ids = data.get('draft_ids', [])
 
     if not name:
-        return jsonify({"error": "Missing required parameter: name"}), 400
+        return _json_response({"error": "Missing required parameter: name"}, 400)
 
     # Generate a unique ID for this playlist
     playlist_id = str(uuid.uuid4())
-    now = datetime.now().isoformat()
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-    try:
-        # Validate draft IDs
-        if draft_ids:
-            placeholders = ','.join(['?'] * len(draft_ids))
-            cursor.execute(f'SELECT draft_id FROM drafts WHERE draft_id IN ({placeholders})', draft_ids)
-            valid_draft_ids = [row['draft_id'] for row in cursor.fetchall()]
-
-            invalid_drafts = [draft_id for draft_id in draft_ids if draft_id not in valid_draft_ids]
-            if invalid_drafts:
-                return jsonify({
-                    "error": "Some draft IDs are invalid",
-                    "invalid_drafts": invalid_drafts
-                }), 400
-
-        # Begin transaction
-        conn.execute('BEGIN TRANSACTION')
-
-        # Create playlist
-        cursor.execute('''
-        INSERT INTO playlists (playlist_id, name, description, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (playlist_id, name, description, now, now))
-
-        # Add drafts to playlist if provided
-        if draft_ids:
-            for draft_id in draft_ids:
-                cursor.execute('''
-                INSERT INTO playlist_drafts (playlist_id, draft_id, added_at)
-                VALUES (?, ?, ?)
-                ''', (playlist_id, draft_id, now))
-
-        # Commit transaction
-        conn.commit()
-
-        return jsonify({
-            "status": "success",
-            "message": "Playlist created successfully",
-            "playlist_id": playlist_id
-        })
-    except Exception as e:
-        conn.rollback()
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+        try:
+            # Validate draft IDs
+            if draft_ids:
+                invalid_drafts = _invalid_draft_ids(cursor, draft_ids)
+                if invalid_drafts:
+                    return _json_response({
+                        "error": "Some draft IDs are invalid",
+                        "invalid_drafts": invalid_drafts
+                    }, 400)
+
+            # Begin transaction
+            conn.execute('BEGIN TRANSACTION')
+
+            # Create playlist
+            cursor.execute(f'''
+            INSERT INTO playlists (playlist_id, name, description, created_at, updated_at)
+            VALUES (?, ?, ?, {SQL_NOW}, {SQL_NOW})
+            ''', (playlist_id, name, description))
+
+            # Add drafts to playlist if provided (repeated IDs are ignored)
+            if draft_ids:
+                cursor.executemany(f'''
+                INSERT OR IGNORE INTO playlist_drafts (playlist_id, draft_id, added_at)
+                VALUES (?, ?, {SQL_NOW})
+                ''', [(playlist_id, draft_id) for draft_id in draft_ids])
+
+            # Commit transaction
+            conn.commit()
+
+            return _json_response({
+                "status": "success",
+                "message": "Playlist created successfully",
+                "playlist_id": playlist_id
+            })
+        except Exception as e:
+            conn.rollback()
+            return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
 @app.route('/library/playlists/<playlist_id>', methods=['GET'])
 def get_playlist_by_id(playlist_id):
     """
     Endpoint to get a specific playlist with its drafts
     """
-    conn = get_db_connection()
+    # The connection stays open until the streamed response is closed
+    resources = ExitStack()
+    try:
+        conn = resources.enter_context(streaming_connection())
+    except StreamingBusy:
+        return _json_response({"error": "Server is busy, please retry shortly"}, 503)
     cursor = conn.cursor()
 
     try:
-        # Get playlist info
-        cursor.execute('SELECT * FROM playlists WHERE playlist_id = ?', (playlist_id,))
+        # Read the playlist and its drafts from one snapshot
+        conn.execute('BEGIN')
+
+        # Get playlist info (draft_count is kept up to date by triggers)
+        cursor.execute(f'SELECT {PLAYLIST_COLUMNS} FROM playlists WHERE playlist_id = ?', (playlist_id,))
         playlist = cursor.fetchone()
 
         if not playlist:
-            return jsonify({"error": "Playlist ID not found"}), 404
+            resources.close()
+            return _json_response({"error": "Playlist ID not found"}, 404)
 
-        playlist_dict = dict(playlist)
+        head = dict(playlist)
 
         # Get drafts in this playlist
-        cursor.execute('''
-        SELECT d.*, pd.added_at
-        FROM drafts d
-        JOIN playlist_drafts pd ON d.draft_id = pd.draft_id
+        cursor.execute(f'''
+        SELECT {DRAFT_COLUMNS}, pd.added_at
+        FROM drafts
+        JOIN playlist_drafts pd ON drafts.draft_id = pd.draft_id
         WHERE pd.playlist_id = ?
         ORDER BY pd.added_at DESC
         ''', (playlist_id,))
-
-        drafts = []
-        for row in cursor.fetchall():
-            draft = dict(row)
-            draft['tags'] = json.loads(draft['tags'] or '[]')
-            draft['references'] = json.loads(draft['reference_list'] or '[]')
-            drafts.append(draft)
-
-        response = {
-            "playlist_id": playlist_dict["playlist_id"],
-            "name": playlist_dict["name"],
-            "description": playlist_dict["description"],
-            "created_at": playlist_dict["created_at"],
-            "updated_at": playlist_dict["updated_at"],
-            "draft_count": len(drafts),
-            "drafts": drafts
-        }
-
-        return jsonify(response)
     except Exception as e:
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+        resources.close()
+        return _json_response({"error": f"Database error: {str(e)}"}, 500)
+
+    return _streamed_json_response(head, "drafts", cursor, resources.close)
 
 @app.route('/library/playlists/<playlist_id>/drafts', methods=['POST'])
 def add_drafts_to_playlist(playlist_id):
@@ -1163,195 +1697,150 @@ def add_drafts_to_playlist(playlist_id):
         "draft_ids": ["draft-id-1", "draft-id-2"]
     }
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    try:
-        # Check if playlist exists
-        cursor.execute('SELECT playlist_id FROM playlists WHERE playlist_id = ?', (playlist_id,))
-        if not cursor.fetchone():
-            return jsonify({"error": "Playlist ID not found"}), 404
-
-        data = request.json
-        if not data:
-            return jsonify({"error": "Request body must be JSON"}), 400
-
-        draft_ids = data.get('draft_ids', [])
-        if not draft_ids:
-            return jsonify({"error": "Missing required parameter: draft_ids"}), 400
-
-        # Validate draft IDs
-        placeholders = ','.join(['?'] * len(draft_ids))
-        cursor.execute(f'SELECT draft_id FROM drafts WHERE draft_id IN ({placeholders})', draft_ids)
-        valid_draft_ids = [row['draft_id'] for row in cursor.fetchall()]
-
-        invalid_drafts = [draft_id for draft_id in draft_ids if draft_id not in valid_draft_ids]
-        if invalid_drafts:
-            return jsonify({
-                "error": "Some draft IDs are invalid",
-                "invalid_drafts": invalid_drafts
-            }), 400
-
-        # Begin transaction
-        conn.execute('BEGIN TRANSACTION')
-
-        # Get existing drafts in playlist
-        cursor.execute('SELECT draft_id FROM playlist_drafts WHERE playlist_id = ?', (playlist_id,))
-        existing_draft_ids = [row['draft_id'] for row in cursor.fetchall()]
-
-        # Add new drafts (avoiding duplicates)
-        now = datetime.now().isoformat()
-        added_count = 0
-
-        for draft_id in draft_ids:
-            if draft_id not in existing_draft_ids:
-                cursor.execute('''
-                INSERT INTO playlist_drafts (playlist_id, draft_id, added_at)
-                VALUES (?, ?, ?)
-                ''', (playlist_id, draft_id, now))
-                added_count += 1
-
-        # Update playlist updated_at timestamp
-        cursor.execute('''
-        UPDATE playlists SET updated_at = ? WHERE playlist_id = ?
-        ''', (now, playlist_id))
-
-        # Commit transaction
-        conn.commit()
-
-        # Get new total count
-        cursor.execute('SELECT COUNT(*) as count FROM playlist_drafts WHERE playlist_id = ?', (playlist_id,))
-        total_count = cursor.fetchone()['count']
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-        return jsonify({
-            "status": "success",
-            "message": f"Added {added_count} drafts to playlist",
-            "playlist_id": playlist_id,
-            "draft_count": total_count
-        })
-    except Exception as e:
-        conn.rollback()
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+        try:
+            data = request.json
+            if not data:
+                return _json_response({"error": "Request body must be JSON"}, 400)
+
+            draft_ids = list(dict.fromkeys(data.get('draft_ids', [])))
+            if not draft_ids:
+                return _json_response({"error": "Missing required parameter: draft_ids"}, 400)
+
+            # Begin transaction
+            conn.execute('BEGIN TRANSACTION')
+
+            # Add new drafts in one statement per id: rows are only inserted when both the
+            # playlist and the draft exist, and the primary key skips ones already present
+            cursor.executemany(f'''
+            INSERT OR IGNORE INTO playlist_drafts (playlist_id, draft_id, added_at)
+            SELECT ?, ?, {SQL_NOW}
+            WHERE EXISTS (SELECT 1 FROM playlists WHERE playlist_id = ?)
+              AND EXISTS (SELECT 1 FROM drafts WHERE draft_id = ?)
+            ''', [(playlist_id, draft_id, playlist_id, draft_id) for draft_id in draft_ids])
+            added_count = cursor.rowcount
+
+            # Touch the playlist and read back the trigger-maintained count; no row means
+            # the playlist doesn't exist
+            row = cursor.execute(f'''
+            UPDATE playlists SET updated_at = {SQL_NOW} WHERE playlist_id = ?
+            RETURNING draft_count
+            ''', (playlist_id,)).fetchone()
+            if row is None:
+                conn.rollback()
+                return _json_response({"error": "Playlist ID not found"}, 404)
+
+            # Fewer rows than ids means some were already present or don't exist;
+            # only then is it worth looking up which
+            if added_count < len(draft_ids):
+                invalid_drafts = _invalid_draft_ids(cursor, draft_ids)
+                if invalid_drafts:
+                    conn.rollback()
+                    return _json_response({
+                        "error": "Some draft IDs are invalid",
+                        "invalid_drafts": invalid_drafts
+                    }, 400)
+
+            # Commit transaction
+            conn.commit()
+            total_count = row['draft_count']
+
+            return _json_response({
+                "status": "success",
+                "message": f"Added {added_count} drafts to playlist",
+                "playlist_id": playlist_id,
+                "draft_count": total_count
+            })
+        except Exception as e:
+            conn.rollback()
+            return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
 @app.route('/library/playlists/<playlist_id>/drafts/<draft_id>', methods=['DELETE'])
 def remove_draft_from_playlist(playlist_id, draft_id):
     """
     Endpoint to remove a draft from a playlist
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    try:
-        # Check if the draft is in the playlist
-        cursor.execute('''
-        SELECT * FROM playlist_drafts
-        WHERE playlist_id = ? AND draft_id = ?
-        ''', (playlist_id, draft_id))
-
-        if not cursor.fetchone():
-            return jsonify({"error": "Draft is not in this playlist"}), 404
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-        # Begin transaction
-        conn.execute('BEGIN TRANSACTION')
+        try:
+            # Begin transaction
+            conn.execute('BEGIN TRANSACTION')
 
-        # Remove the draft from the playlist
-        cursor.execute('''
-        DELETE FROM playlist_drafts
-        WHERE playlist_id = ? AND draft_id = ?
-        ''', (playlist_id, draft_id))
+            # Remove the draft from the playlist; no row deleted means it wasn't there
+            cursor.execute('''
+            DELETE FROM playlist_drafts
+            WHERE playlist_id = ? AND draft_id = ?
+            ''', (playlist_id, draft_id))
 
-        # Update playlist updated_at timestamp
-        now = datetime.now().isoformat()
-        cursor.execute('''
-        UPDATE playlists SET updated_at = ? WHERE playlist_id = ?
-        ''', (now, playlist_id))
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return _json_response({"error": "Draft is not in this playlist"}, 404)
 
-        # Get new total count
-        cursor.execute('SELECT COUNT(*) as count FROM playlist_drafts WHERE playlist_id = ?', (playlist_id,))
-        total_count = cursor.fetchone()['count']
+            # Touch the playlist and read back the trigger-maintained count
+            total_count = cursor.execute(f'''
+            UPDATE playlists SET updated_at = {SQL_NOW} WHERE playlist_id = ?
+            RETURNING draft_count
+            ''', (playlist_id,)).fetchone()['draft_count']
 
-        # Commit transaction
-        conn.commit()
+            # Commit transaction
+            conn.commit()
 
-        return jsonify({
-            "status": "success",
-            "message": "Draft removed from playlist",
-            "playlist_id": playlist_id,
-            "draft_count": total_count
-        })
-    except Exception as e:
-        conn.rollback()
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+            return _json_response({
+                "status": "success",
+                "message": "Draft removed from playlist",
+                "playlist_id": playlist_id,
+                "draft_count": total_count
+            })
+        except Exception as e:
+            conn.rollback()
+            return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
 @app.route('/library/playlists/<playlist_id>', methods=['DELETE'])
 def delete_playlist(playlist_id):
     """
     Endpoint to delete a playlist
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    try:
-        # Check if playlist exists
-        cursor.execute('SELECT playlist_id FROM playlists WHERE playlist_id = ?', (playlist_id,))
-        if not cursor.fetchone():
-            return jsonify({"error": "Playlist ID not found"}), 404
-
-        # Begin transaction
-        conn.execute('BEGIN TRANSACTION')
-
-        # Delete playlist (cascade will delete playlist_drafts entries)
-        cursor.execute('DELETE FROM playlists WHERE playlist_id = ?', (playlist_id,))
-
-        # Commit transaction
-        conn.commit()
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-        return jsonify({
-            "status": "success",
-            "message": "Playlist deleted successfully"
-        })
-    except Exception as e:
-        conn.rollback()
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+        try:
+            # Delete playlist (cascade will delete playlist_drafts entries)
+            cursor.execute('DELETE FROM playlists WHERE playlist_id = ?', (playlist_id,))
+            if cursor.rowcount == 0:
+                return _json_response({"error": "Playlist ID not found"}, 404)
+
+            return _json_response({
+                "status": "success",
+                "message": "Playlist deleted successfully"
+            })
+        except Exception as e:
+            conn.rollback()
+            return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
 @app.route('/library/drafts/<draft_id>', methods=['DELETE'])
 def delete_draft(draft_id):
     """
     Endpoint to delete a draft from the library
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    try:
-        # Check if draft exists
-        cursor.execute('SELECT draft_id FROM drafts WHERE draft_id = ?', (draft_id,))
-        if not cursor.fetchone():
-            return jsonify({"error": "Draft ID not found"}), 404
-
-        # Begin transaction
-        conn.execute('BEGIN TRANSACTION')
-
-        # Delete draft (cascade will delete from playlist_drafts)
-        cursor.execute('DELETE FROM drafts WHERE draft_id = ?', (draft_id,))
-
-        # Commit transaction
-        conn.commit()
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-        return jsonify({
-            "status": "success",
-            "message": "Draft deleted successfully"
-        })
-    except Exception as e:
-        conn.rollback()
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+        try:
+            # Delete draft (cascade will delete from playlist_drafts)
+            cursor.execute('DELETE FROM drafts WHERE draft_id = ?', (draft_id,))
+            if cursor.rowcount == 0:
+                return _json_response({"error": "Draft ID not found"}, 404)
+
+            return _json_response({
+                "status": "success",
+                "message": "Draft deleted successfully"
+            })
+        except Exception as e:
+            conn.rollback()
+            return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
 @app.route('/library/drafts/<draft_id>', methods=['PUT'])
 def update_draft(draft_id):
@@ -1364,131 +1853,92 @@ def update_draft(draft_id):
         "tags": ["tag1", "tag2"]
     }
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    try:
-        # Check if draft exists
-        cursor.execute('SELECT * FROM drafts WHERE draft_id = ?', (draft_id,))
-        draft = cursor.fetchone()
-
-        if not draft:
-            return jsonify({"error": "Draft ID not found"}), 404
+    data = request.json
+    if not data:
+        return _json_response({"error": "Request body must be JSON"}, 400)
 
-        data = request.json
-        if not data:
-            return jsonify({"error": "Request body must be JSON"}), 400
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-        # Begin transaction
-        conn.execute('BEGIN TRANSACTION')
+        try:
+            # Update fields
+            updates = []
+            params = []
 
-        # Update fields
-        updates = []
-        params = []
+            if 'title' in data:
+                updates.append("title = ?")
+                params.append(data['title'])
 
-        if 'title' in data:
-            updates.append("title = ?")
-            params.append(data['title'])
+            if 'tags' in data:
+                updates.append("tags = ?")
+                params.append(orjson.dumps(data['tags']).decode())
 
-        if 'tags' in data:
-            updates.append("tags = ?")
-            params.append(json.dumps(data['tags']))
+            # Add updated_at timestamp
+            updates.append(f"updated_at = {SQL_NOW}")
 
-        # Add updated_at timestamp
-        updates.append("updated_at = ?")
-        now = datetime.now().isoformat()
-        params.append(now)
+            # Add draft_id to params
+            params.append(draft_id)
 
-        # Add draft_id to params
-        params.append(draft_id)
+            # A single UPDATE both checks that the draft exists and returns its new state
+            query = f"UPDATE drafts SET {', '.join(updates)} WHERE draft_id = ? RETURNING {DRAFT_COLUMNS}"
+            rows = cursor.execute(query, params).fetchall()
 
-        # Execute update
-        if updates:
-            query = f"UPDATE drafts SET {', '.join(updates)} WHERE draft_id = ?"
-            cursor.execute(query, params)
+            if not rows:
+                return _json_response({"error": "Draft ID not found"}, 404)
 
-        # Commit transaction
-        conn.commit()
+            updated_draft = dict(rows[0])
 
-        # Get updated draft
-        cursor.execute('SELECT * FROM drafts WHERE draft_id = ?', (draft_id,))
-        updated_draft = dict(cursor.fetchone())
-        updated_draft['tags'] = json.loads(updated_draft['tags'] or '[]')
-        updated_draft['references'] = json.loads(updated_draft['reference_list'] or '[]')
-
-        return jsonify({
-            "status": "success",
-            "message": "Draft updated successfully",
-            "draft": updated_draft
-        })
-    except Exception as e:
-        conn.rollback()
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+            return _json_response({
+                "status": "success",
+                "message": "Draft updated successfully",
+                "draft": updated_draft
+            })
+        except Exception as e:
+            conn.rollback()
+            return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
 @app.route('/library/tags', methods=['GET'])
 def get_all_tags():
     """
     Endpoint to get all unique tags used in the library
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    try:
-        cursor.execute('SELECT tags FROM drafts')
-        rows = cursor.fetchall()
-
-        # Extract and flatten all tags
-        all_tags = set()
-        for row in rows:
-            tags = json.loads(row['tags'] or '[]')
-            for tag in tags:
-                all_tags.add(tag)
-
-        tags_list = sorted(list(all_tags))
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-        return jsonify({
-            "count": len(tags_list),
-            "tags": tags_list
-        })
-    except Exception as e:
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
+        try:
+            # draft_tags already holds one row per tag, so the tag index yields them sorted and unique
+            cursor.execute('SELECT DISTINCT tag FROM draft_tags ORDER BY tag')
+            tags_list = [row['tag'] for row in cursor.fetchall()]
+
+            return _json_response({
+                "count": len(tags_list),
+                "tags": tags_list
+            })
+        except Exception as e:
+            return _json_response({"error": f"Database error: {str(e)}"}, 500)
 
-# Cleanup function to periodically remove old research results from memory
+# Cleanup function to periodically remove old research results
 def cleanup_old_research():
-    """Remove research results older than 24 hours from memory"""
-    import time
+    """Remove research results finished more than 24 hours ago"""
     from datetime import timedelta
 
+    # Runs finished before this process started are not in the expiry heap, so sweep them once
+    try:
+        cutoff = (datetime.now() - timedelta(seconds=RESEARCH_TTL_SECONDS)).isoformat()
+        for research_id in research_store.purge_finished(cutoff):
+            print(f"Cleaned up old research data: {research_id}")
+    except Exception as e:
+        print(f"Error in cleanup task: {str(e)}")
+
     while True:
         try:
-            current_time = datetime.now()
-            to_delete = []
-
-            for research_id, data in research_results.items():
-                # Check if research is completed or errored
-                if data.get("status") in ["completed", "error"]:
-                    # Check if it has a timestamp
-                    completed_at = data.get("completed_at") or data.get("error_at")
-                    if completed_at:
-                        completed_time = datetime.fromisoformat(completed_at)
-                        # Delete if older than 24 hours
-                        if current_time - completed_time > timedelta(hours=24):
-                            to_delete.append(research_id)
-
-            # Delete old research results
-            for research_id in to_delete:
-                del research_results[research_id]
+            for research_id in research_store.purge_expired():
                 print(f"Cleaned up old research data: {research_id}")
-
         except Exception as e:
             print(f"Error in cleanup task: {str(e)}")
 
-        # Sleep for 1 hour
-        time.sleep(3600)
+        # Sleep until the next run expires, or until one finishes if none are pending
+        research_store.wait_for_expiry()
 
 if __name__ == '__main__':
     print("\n" + "="*50)
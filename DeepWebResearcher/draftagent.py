@@ -2,12 +2,26 @@ import os
 from dotenv import load_dotenv
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import AIMessage
+from langchain_core.output_parsers import BaseOutputParser, StrOutputParser, JsonOutputParser
+from langchain_core.outputs import Generation
+from langchain_core.rate_limiters import InMemoryRateLimiter
 from langchain.tools.tavily_search import TavilySearchResults
 from langchain_core.tools import Tool
 from typing import List, Dict, Any, TypedDict, Annotated, Literal
+from collections import OrderedDict
+import asyncio
+import hashlib
+import importlib.util
 import json
+import orjson
 import re
+import threading
+import time
+import httpx
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+from rate_limits import is_rate_limited
 from langgraph.graph import StateGraph, END
 
 
@@ -16,18 +30,282 @@ load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 
+# Every research workflow runs on this one event loop, kept on a daemon thread. Pooled async
+# connections belong to the loop that opened them, so they can only be reused across
+# workflows if the workflows all run on the same loop
+_event_loop = asyncio.new_event_loop()
+_event_loop_thread = threading.Thread(target=_event_loop.run_forever, name="research-loop", daemon=True)
+_event_loop_thread.start()
+
+def run_async(coroutine):
+    """Run a coroutine on the shared event loop and block until it finishes"""
+    if threading.current_thread() is _event_loop_thread:
+        # Blocking here would stop the loop from ever running the coroutine; code already
+        # on the loop has to await it instead
+        coroutine.close()
+        raise RuntimeError("run_async() called from the research event loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coroutine, _event_loop).result()
+
+# HTTP clients shared by both Groq models so requests reuse kept-alive connections instead
+# of paying a TLS handshake each; HTTP/2 multiplexes concurrent calls when h2 is installed
+GROQ_HTTP_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+GROQ_HTTP2 = importlib.util.find_spec("h2") is not None
+groq_http_client = httpx.Client(limits=GROQ_HTTP_LIMITS, http2=GROQ_HTTP2)
+groq_async_http_client = httpx.AsyncClient(limits=GROQ_HTTP_LIMITS, http2=GROQ_HTTP2)
+
+# Both models draw from one request budget, so parallel claim verification is paced instead of
+# bursting past the account's rate limit
+GROQ_REQUESTS_PER_SECOND = float(os.getenv("GROQ_REQUESTS_PER_SECOND", "30"))
+groq_rate_limiter = InMemoryRateLimiter(
+    requests_per_second=GROQ_REQUESTS_PER_SECOND,
+    check_every_n_seconds=0.05,
+    max_bucket_size=GROQ_REQUESTS_PER_SECOND
+)
+
 research_llm = ChatGroq(
     api_key=GROQ_API_KEY,
-    model_name="deepseek-r1-distill-llama-70b"
+    model_name="deepseek-r1-distill-llama-70b",
+    http_client=groq_http_client,
+    http_async_client=groq_async_http_client,
+    rate_limiter=groq_rate_limiter
 )
 #here we are using the same model for factchecking and the research but we can change the different trusted models like OpenAI models etc...
 fact_checker_llm = ChatGroq(
     api_key=GROQ_API_KEY,
-    model_name="deepseek-r1-distill-llama-70b"
+    model_name="deepseek-r1-distill-llama-70b",
+    http_client=groq_http_client,
+    http_async_client=groq_async_http_client,
+    rate_limiter=groq_rate_limiter
+)
+# Query rewriting, claim extraction and the per-claim JSON verdicts are short structured tasks, so
+# they go to a small fast model; the 70B models are kept for summaries, the report and the draft.
+# Groq limits each model separately, so this one has its own request budget
+extraction_rate_limiter = InMemoryRateLimiter(
+    requests_per_second=GROQ_REQUESTS_PER_SECOND,
+    check_every_n_seconds=0.05,
+    max_bucket_size=GROQ_REQUESTS_PER_SECOND
+)
+extraction_llm = ChatGroq(
+    api_key=GROQ_API_KEY,
+    model_name="llama-3.1-8b-instant",
+    http_client=groq_http_client,
+    http_async_client=groq_async_http_client,
+    rate_limiter=extraction_rate_limiter
 )
 
 tavily_search = TavilySearchResults(api_key=TAVILY_API_KEY)
 
+# Back off with jitter when Groq or Tavily answer 429, so concurrent callers don't retry in lockstep
+retry_on_rate_limit = retry(
+    retry=retry_if_exception(is_rate_limited),
+    wait=wait_exponential_jitter(initial=1, max=30),
+    stop=stop_after_attempt(5),
+    reraise=True
+)
+
+@retry_on_rate_limit
+async def ainvoke_with_retry(runnable, value):
+    return await runnable.ainvoke(value)
+
+@retry_on_rate_limit
+async def _start_stream(llm, value):
+    stream = llm.astream(value)
+    try:
+        return stream, await stream.__anext__()
+    except StopAsyncIteration:
+        return stream, None
+    except BaseException:
+        await stream.aclose()
+        raise
+
+async def astream_with_retry(llm, value):
+    """Stream a response, retrying a rate limit raised before the first chunk as ainvoke_with_retry does"""
+    stream, first_chunk = await _start_stream(llm, value)
+    if first_chunk is None:
+        return
+    yield first_chunk
+    async for chunk in stream:
+        yield chunk
+
+class SearchRateLimited(Exception):
+    """A Tavily 429 that TavilySearchResults reported as text instead of raising"""
+    status_code = 429
+
+RATE_LIMIT_TEXT_RE = re.compile(r"\b429\b|too many requests", re.IGNORECASE)
+
+@retry_on_rate_limit
+async def search_with_retry(search_tool, query):
+    """
+    Run a Tavily search and return its list of results, or None if the search failed.
+    TavilySearchResults returns the repr of an API error instead of raising it, so a
+    rate limit in that text is raised here for the retry policy to back off on.
+    """
+    results = await search_tool.ainvoke(query)
+    if isinstance(results, list):
+        return results
+    if isinstance(results, str) and RATE_LIMIT_TEXT_RE.search(results):
+        raise SearchRateLimited(results)
+    print(f"Warning: search for {query!r} failed: {results}")
+    return None
+
+def _extract_first_json(text: str) -> str:
+    """Return the first JSON object or array in text, up to its matching close bracket"""
+    start = next((i for i, char in enumerate(text) if char in "{["), None)
+    if start is None:
+        raise OutputParserException(f"No JSON found in output: {text}", llm_output=text)
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    # Unbalanced; hand the rest over so the decode error points at the problem
+    return text[start:]
+
+class FastJsonParser(BaseOutputParser):
+    """Parse the first JSON value in a model response with orjson, skipping any <think> section"""
+
+    def parse(self, text: str):
+        try:
+            return orjson.loads(_extract_first_json(THINK_RE.sub('', text)))
+        except orjson.JSONDecodeError as e:
+            raise OutputParserException(f"Invalid json output: {text}", llm_output=text) from e
+
+    @property
+    def _type(self) -> str:
+        return "fast_json"
+
+# Output parsers hold no per-call state, so every chain shares these. The JsonOutputParser
+# is only kept for its partial parsing of streamed claims
+str_parser = StrOutputParser()
+json_parser = FastJsonParser()
+partial_json_parser = JsonOutputParser()
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire a fixed number of seconds after being stored"""
+
+    def __init__(self, max_size, ttl_seconds):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+# Cache of LLM responses keyed by model and rendered prompt, so a query or set of sources
+# seen recently reuses the earlier answer instead of calling the model again
+LLM_CACHE_SIZE = 256
+LLM_CACHE_TTL_SECONDS = 24 * 60 * 60
+_llm_cache = TTLCache(LLM_CACHE_SIZE, LLM_CACHE_TTL_SECONDS)
+
+def _llm_cache_key(llm, prompt_value):
+    payload = json.dumps({"model": llm.model_name, "prompt": prompt_value.to_string()}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+async def cached_ainvoke(prompt, llm, parser, inputs):
+    """Run prompt | llm | parser, reusing the model's response if this exact prompt was answered recently"""
+    prompt_value = prompt.invoke(inputs)
+    key = _llm_cache_key(llm, prompt_value)
+    message = _llm_cache.get(key)
+    if message is not None:
+        return parser.invoke(message)
+
+    message = await ainvoke_with_retry(llm, prompt_value)
+    # Parse before caching so a malformed response is retried next time rather than reused
+    result = parser.invoke(message)
+    _llm_cache.put(key, message)
+    return result
+
+async def cached_astream(prompt, llm, inputs):
+    """Stream the text of the model's response, replaying a recently cached response as one piece"""
+    prompt_value = prompt.invoke(inputs)
+    key = _llm_cache_key(llm, prompt_value)
+    message = _llm_cache.get(key)
+    if message is not None:
+        yield message.content
+        return
+
+    message = None
+    async for chunk in astream_with_retry(llm, prompt_value):
+        message = chunk if message is None else message + chunk
+        yield chunk.content
+    if message is not None:
+        _llm_cache.put(key, message)
+
+# Reasoning models wrap their chain of thought in <think> tags, which never belongs in the output
+THINK_RE = re.compile(r'<think>.*?</think>', re.DOTALL)
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+async def strip_think_stream(chunks):
+    """Yield the text of a token stream with <think>...</think> sections dropped as they arrive"""
+    buffer = ""
+    thinking = False
+    async for chunk in chunks:
+        buffer += chunk
+        while True:
+            marker = THINK_CLOSE if thinking else THINK_OPEN
+            index = buffer.find(marker)
+            if index == -1:
+                break
+            if not thinking and index:
+                yield buffer[:index]
+            buffer = buffer[index + len(marker):]
+            thinking = not thinking
+
+        # Hold back just enough of the tail to recognise a marker split across chunks
+        keep = len(marker) - 1
+        if thinking:
+            buffer = buffer[-keep:]
+        elif len(buffer) > keep:
+            yield buffer[:-keep]
+            buffer = buffer[-keep:]
+
+    if not thinking and buffer:
+        yield buffer
+
+# Format search results as the Source/Title/Content blocks the prompts and extract_references expect
+def format_search_results(search_results):
+    return "\n\n".join(
+        f"Source: {result.get('url', 'Unknown')}\n"
+        f"Title: {result.get('title', 'No title')}\n"
+        f"Content: {result.get('content', 'No content')}"
+        for result in search_results
+    )
+
 summarize_prompt = ChatPromptTemplate.from_template("""
 You are a research assistant that summarizes and structures search results.
 
@@ -45,7 +323,7 @@ Please provide a well-structured summary that:
 Your summary should be detailed enough to provide valuable insights on the query: {query}
 """)
 
-def summarize_search_results(query: str, search_results: List[Dict[str, Any]]) -> str:
+async def summarize_search_results(query: str, search_results: List[Dict[str, Any]]) -> str:
     """Summarize and structure search results using LLM"""
     try:
         # Ensure search_results is a list
@@ -57,34 +335,38 @@ def summarize_search_results(query: str, search_results: List[Dict[str, Any]]) -
                 search_results = []
 
         # Format search results
-        formatted_results = "\n\n".join([
-            f"Source: {result.get('url', 'Unknown')}\n"
-            f"Title: {result.get('title', 'No title')}\n"
-            f"Content: {result.get('content', 'No content')}"
-            for result in search_results
-        ])
+        formatted_results = format_search_results(search_results)
 
         #  summarization chain
-        chain = summarize_prompt | research_llm | StrOutputParser()
-        return chain.invoke({"query": query, "search_results": formatted_results})
+        return await cached_ainvoke(summarize_prompt, research_llm, str_parser, {
+            "query": query,
+            "search_results": formatted_results
+        })
     except Exception as e:
         print(f"Error in summarize_search_results: {str(e)}")
         return f"Could not summarize search results due to an error: {str(e)}"
 # Creating  custom  summarization tool
-def parse_summarize_input(input_str):
+async def aparse_summarize_input(input_str):
     """Parse the input for the summarize tool, handling potential JSON format issues."""
     try:
         # JSON parsing
         data = json.loads(input_str)
-        return summarize_search_results(data["query"], data["results"])
+        return await summarize_search_results(data["query"], data["results"])
     except json.JSONDecodeError:
         print(f"Failed to parse input as JSON: {input_str}")
         return "Error: Input must be a JSON string with 'query' and 'results' fields. Please format your input correctly."
 
+def parse_summarize_input(input_str):
+    """Blocking version of aparse_summarize_input, for callers outside the research event loop"""
+    return run_async(aparse_summarize_input(input_str))
+
+# Async callers (including anything running on the research loop) get the coroutine, so the
+# tool never blocks the loop waiting on itself
 summarize_tool = Tool(
     name="SummarizeResults",
     description="Summarizes and structures search results into a comprehensive research output. Input must be a JSON string with 'query' and 'results' fields.",
-    func=parse_summarize_input
+    func=parse_summarize_input,
+    coroutine=aparse_summarize_input
 )
 
 # Tavily search tool for fact verification wecan do with other avaikable tools for verification
@@ -94,37 +376,82 @@ fact_verification_search = TavilySearchResults(
     search_depth="advanced"
 )
 
-# Function to extract key claims from research output
-def extract_claims(research_output):
-    try:
-        extraction_prompt = ChatPromptTemplate.from_template("""
-        You are an expert at identifying factual claims in text.
-        From the following research output, extract the 3-5 most significant factual claims that should be verified.
-
-        Research output:
-        {research_output}
+# Formatted verification search results by normalized claim text; the same claims come up
+# again across runs on similar topics, and a day-old search is still good evidence
+SEARCH_CACHE_SIZE = 1024
+SEARCH_CACHE_TTL_SECONDS = 24 * 60 * 60
+_search_cache = TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL_SECONDS)
 
-        For each claim, provide:
-        1. The claim statement
-        2. The importance of verifying this claim (high/medium/low)
+# claim extraction prompt
+extraction_prompt = ChatPromptTemplate.from_template("""
+You are an expert at identifying factual claims in text.
+From the following research output, extract the 3-5 most significant factual claims that should be verified.
 
-        Format your response as a JSON array of objects with "claim" and "importance" fields.
-        """)
+Research output:
+{research_output}
 
-        chain = extraction_prompt | fact_checker_llm | JsonOutputParser()
-        result = chain.invoke({"research_output": research_output})
+For each claim, provide:
+1. The claim statement
+2. The importance of verifying this claim (high/medium/low)
 
-        # Ensure we return a list
-        if not isinstance(result, list):
-            print(f"Warning: Expected list of claims, got {type(result)}")
-            if isinstance(result, dict) and "claim" in result:
-                return [result]
-            return [{"claim": "No claims could be extracted", "importance": "low"}]
+Format your response as a JSON array of objects with "claim" and "importance" fields.
+""")
 
-        return result
-    except Exception as e:
-        print(f"Error in extract_claims: {str(e)}")
-        return [{"claim": f"Error extracting claims: {str(e)}", "importance": "low"}]
+# Ensure the extracted claims are a list
+def is_claim(item):
+    return isinstance(item, dict) and isinstance(item.get("claim"), str) and item["claim"].strip() != ""
+
+def normalize_claims(result):
+    if not isinstance(result, list):
+        print(f"Warning: Expected list of claims, got {type(result)}")
+        if is_claim(result):
+            return [result]
+        return [{"claim": "No claims could be extracted", "importance": "low"}]
+
+    # Drop anything without claim text, which couldn't be searched for or verified
+    return [item for item in result if is_claim(item)]
+
+# Function to extract key claims from research output. The response is streamed and each
+# claim is yielded as soon as the model has finished writing it, so work on the first
+# claims can start while the rest are still being generated
+async def stream_claims(research_output):
+    prompt_value = extraction_prompt.invoke({"research_output": research_output})
+    key = _llm_cache_key(extraction_llm, prompt_value)
+    message = _llm_cache.get(key)
+    if message is not None:
+        for claim_item in normalize_claims(json_parser.parse(message.content)):
+            yield claim_item
+        return
+
+    pieces = []
+    emitted = 0
+    async for chunk in astream_with_retry(extraction_llm, prompt_value):
+        pieces.append(chunk.content)
+        # A claim can only have been completed by a chunk that closes an object, so the
+        # text so far is only re-parsed then, not on every token
+        if "}" not in chunk.content:
+            continue
+        text = THINK_RE.sub('', "".join(pieces))
+        if THINK_OPEN in text:
+            # Still reasoning; any braces so far belong to the <think> section
+            continue
+        partial = partial_json_parser.parse_result([Generation(text=text)], partial=True)
+        # Every element of the partial array except the last is complete
+        if isinstance(partial, list):
+            while emitted < len(partial) - 1:
+                for claim_item in normalize_claims([partial[emitted]]):
+                    yield claim_item
+                emitted += 1
+
+    message = AIMessage(content="".join(pieces))
+    result = json_parser.parse(message.content)
+    _llm_cache.put(key, message)
+    if isinstance(result, list):
+        result = result[emitted:]
+    elif emitted:
+        return
+    for claim_item in normalize_claims(result):
+        yield claim_item
 # credibility check prompt
 credibility_check_prompt = ChatPromptTemplate.from_template("""
 You are a critical fact-checker analyzing research content. Evaluate the following claim:
@@ -152,290 +479,433 @@ Format your response as a JSON object with the following structure:
 }}
 """)
 
-# Function to verify a single claim
-def verify_claim(claim):
-    search_results = fact_verification_search.invoke(claim)
+# Number of claims assessed together in one fact-check LLM call
+VERIFY_BATCH_SIZE = 5
 
-    verification_data = "\n\n".join([
-        f"Source: {result.get('url', 'Unknown')}\n"
-        f"Title: {result.get('title', 'No title')}\n"
-        f"Content: {result.get('content', 'No content')}"
-        for result in search_results
-    ])
+# Fallback assessment for a claim whose fact-check response couldn't be used
+def fallback_verification(claim, error):
+    return {
+        "accuracy_score": 5,
+        "confidence_level": 5,
+        "inaccuracies": [f"Could not properly verify: {str(error)}"],
+        "missing_context": ["Verification process failed"],
+        "potential_biases": ["Unable to assess due to verification failure"],
+        "corrected_claim": claim
+    }
 
-    # Add explicit instruction to not include think tags
-    modified_prompt = ChatPromptTemplate.from_template("""
-    You are a critical fact-checker analyzing research content. Evaluate the following claim:
+# Function to search for evidence on a single claim, formatted for the fact-check prompt
+async def search_claim_async(claim):
+    key = " ".join(claim.lower().split())
+    verification_data = _search_cache.get(key)
+    if verification_data is not None:
+        return verification_data
 
-    CLAIM: {claim}
+    try:
+        search_results = await search_with_retry(fact_verification_search, claim)
+    except Exception as e:
+        print(f"Error searching for evidence on claim: {str(e)}")
+        search_results = None
 
-    Based on your analysis and the provided verification data:
-    {verification_data}
+    # A failed search leaves just this claim without evidence, and isn't cached so the
+    # next run searches again
+    if search_results is None:
+        return ""
 
-    Please provide a detailed assessment with:
-    1. Accuracy score (0-10)
-    2. Confidence level (0-10)
-    3. Specific inaccuracies or misrepresentations (if any)
-    4. Missing context or nuance
-    5. Potential biases in the original claim
+    verification_data = format_search_results(search_results)
+    _search_cache.put(key, verification_data)
+    return verification_data
 
-    Format your response as a JSON object with the following structure:
-    {{
-        "accuracy_score": <score>,
-        "confidence_level": <level>,
-        "inaccuracies": ["<issue1>", "<issue2>", ...],
-        "missing_context": ["<context1>", "<context2>", ...],
-        "potential_biases": ["<bias1>", "<bias2>", ...],
-        "corrected_claim": "<improved version of the claim>"
-    }}
+# batch fact-check prompt, with an explicit instruction to not include think tags
+verify_batch_prompt = ChatPromptTemplate.from_template("""
+You are a critical fact-checker analyzing research content. Evaluate each of the following
+numbered claims using the verification data provided for that claim:
 
-    IMPORTANT: Do not include any <think> or </think> tags in your response. Provide only valid JSON.
-    """)
+{claims}
+
+For each claim, please provide a detailed assessment with:
+1. Accuracy score (0-10)
+2. Confidence level (0-10)
+3. Specific inaccuracies or misrepresentations (if any)
+4. Missing context or nuance
+5. Potential biases in the original claim
+
+Format your response as a JSON array with one object per claim, in the same order as the claims,
+each with the following structure:
+{{
+    "claim_index": <number of the claim>,
+    "accuracy_score": <score>,
+    "confidence_level": <level>,
+    "inaccuracies": ["<issue1>", "<issue2>", ...],
+    "missing_context": ["<context1>", "<context2>", ...],
+    "potential_biases": ["<bias1>", "<bias2>", ...],
+    "corrected_claim": "<improved version of the claim>"
+}}
+
+IMPORTANT: Do not include any <think> or </think> tags in your response. Provide only valid JSON.
+""")
+
+# Function to verify a batch of claims against their search results in a single LLM call.
+# Returns one assessment per claim, in the same order as the claims
+async def verify_claim_batch_async(claims, verification_data):
+    claims_section = "\n\n".join(
+        f"CLAIM {index}: {claim}\n\nVERIFICATION DATA {index}:\n{data}"
+        for index, (claim, data) in enumerate(zip(claims, verification_data), 1)
+    )
 
     try:
-        chain = modified_prompt | fact_checker_llm | JsonOutputParser()
-        result = chain.invoke({"claim": claim, "verification_data": verification_data})
-        return result
+        result = await cached_ainvoke(verify_batch_prompt, extraction_llm, json_parser, {"claims": claims_section})
+        if not isinstance(result, list):
+            raise ValueError(f"Expected a list of assessments, got {type(result)}")
     except Exception as e:
         print(f"Error parsing fact-check response: {str(e)}")
-        # Fallback response if parsing fails
-        return {
-            "accuracy_score": 5,
-            "confidence_level": 5,
-            "inaccuracies": [f"Could not properly verify: {str(e)}"],
-            "missing_context": ["Verification process failed"],
-            "potential_biases": ["Unable to assess due to verification failure"],
-            "corrected_claim": claim
-        }
-# Function to extract references from verification data
-def extract_references(verification_results):
+        # Fallback responses if parsing fails
+        return [fallback_verification(claim, e) for claim in claims]
+
+    # Match assessments to claims by their index, falling back to position
+    assessments = {}
+    for position, assessment in enumerate(result, 1):
+        if isinstance(assessment, dict):
+            index = assessment.pop("claim_index", position)
+            assessments.setdefault(index if isinstance(index, int) else position, assessment)
+
+    return [
+        assessments.get(index) or fallback_verification(claim, "no assessment returned for this claim")
+        for index, claim in enumerate(claims, 1)
+    ]
+# Source lines written into the verification data by search_claim_async
+SOURCE_RE = re.compile(r"Source: (https?://[^\n]+)")
+
+# Function to extract references from verification data, numbered in order of first appearance
+def extract_references(verification_data):
     references = []
-    for i, result in enumerate(verification_results, 1):
-        verification_data = result.get("verification_data", "")
-        sources = re.findall(r"Source: (https?://[^\n]+)", verification_data)
-        for source in sources:
-            if source not in [ref.split(". ")[1] for ref in references]:
+    seen = set()
+    for data in verification_data:
+        for match in SOURCE_RE.finditer(data):
+            source = match.group(1)
+            if source not in seen:
+                seen.add(source)
                 references.append(f"{len(references) + 1}. {source}")
     return references
 
-# query optimization function
-def optimize_query_directly(query: str) -> str:
-    optimization_prompt = ChatPromptTemplate.from_template("""
-    You are a query optimization expert. Your task is to transform natural language queries into
-    detailed, domain-specific optimized queries that can be processed by specialized systems.
+# query optimization prompt
+optimization_prompt = ChatPromptTemplate.from_template("""
+You are a query optimization expert. Your task is to transform natural language queries into
+detailed, domain-specific optimized queries that can be processed by specialized systems.
 
-    Original query: {query}
+Original query: {query}
 
-    Please provide an optimized version of this query that:
-    1. Is more specific and detailed
-    2. Includes relevant domain terminology
-    3. Is structured for better processing by downstream systems
-    4. Maintains the original intent of the query
+Please provide an optimized version of this query that:
+1. Is more specific and detailed
+2. Includes relevant domain terminology
+3. Is structured for better processing by downstream systems
+4. Maintains the original intent of the query
 
-    Optimized query:
-    """)
+Optimized query:
+""")
 
-    chain = optimization_prompt | research_llm | StrOutputParser()
-    return chain.invoke({"query": query})
+# query optimization function
+async def optimize_query_directly(query: str) -> str:
+    return await cached_ainvoke(optimization_prompt, extraction_llm, str_parser, {"query": query})
 
 #  content style selection functions
+CONTENT_STYLES = {1: "blog post", 2: "detailed report", 3: "executive summary"}
+STYLE_PROMPTS = {
+    "blog post": "Create an engaging blog post that presents the research findings in a conversational tone with clear headings, examples, and actionable insights.",
+    "detailed report": "Structure a comprehensive report with executive summary, methodology, findings, analysis, and recommendations. Include relevant data points and cite sources appropriately.",
+    "executive summary": "Provide a concise executive summary highlighting key findings, implications, and recommended actions. Focus on business impact and strategic considerations."
+}
+
 def select_content_style(style_number: int) -> str:
-    styles = {1: "blog post", 2: "detailed report", 3: "executive summary"}
-    return styles.get(style_number, "blog post")  # Default to blog post if invalid number
+    return CONTENT_STYLES.get(style_number, "blog post")  # Default to blog post if invalid number
 
 def get_style_prompt(style: str) -> str:
-    if style == "blog post":
-        return "Create an engaging blog post that presents the research findings in a conversational tone with clear headings, examples, and actionable insights."
-    elif style == "detailed report":
-        return "Structure a comprehensive report with executive summary, methodology, findings, analysis, and recommendations. Include relevant data points and cite sources appropriately."
-    elif style == "executive summary":
-        return "Provide a concise executive summary highlighting key findings, implications, and recommended actions. Focus on business impact and strategic considerations."
+    return STYLE_PROMPTS.get(style)
 
 #states for the LangGraph workflow
 class ResearchState(TypedDict):
     query: str
     optimized_query: str
     pdf_context: str
+    search_results: List[Dict[str, Any]]
+    document_findings: str
     research_output: str
     claims: List[Dict[str, Any]]
+    claim_evidence: List[str]
     verification_results: List[Dict[str, Any]]
     references: List[str]
     fact_check_report: str
     content_style: str
+    draft_body: str
     draft_content: str
     status: str
 
-#nodes for the LangGraph workflow
-def optimize_query(state: ResearchState) -> ResearchState:
+#nodes for the LangGraph workflow; they are coroutines so every search and LLM call in
+# the graph shares one event loop and parallel branches overlap their network waits
+async def optimize_query(state: ResearchState) -> ResearchState:
     print("Optimizing query...")
-    optimized_query = optimize_query_directly(state["query"])
+    optimized_query = await optimize_query_directly(state["query"])
     return {"optimized_query": optimized_query}
 
-def conduct_research(state: ResearchState) -> ResearchState:
+# Web research and document research only depend on the optimized query, so the graph
+# runs them side by side and combine_research joins their results
+async def web_research(state: ResearchState) -> ResearchState:
     print(f"Conducting research on: {state['optimized_query']}")
 
     try:
         # Search for information
-        search_results = tavily_search.invoke(state["optimized_query"])
+        search_results = await search_with_retry(tavily_search, state["optimized_query"])
 
-        # Check if search_results is a list of dictionaries as expected
-        if not isinstance(search_results, list):
-            print(f"Warning: Expected list of search results, got {type(search_results)}")
-            # Convert to expected format if possible
-            if isinstance(search_results, str):
-                search_results = [{"url": "N/A", "title": "Search Result", "content": search_results}]
-            else:
-                # Default empty list
-                search_results = []
+        return {"search_results": search_results or []}
+    except Exception as e:
+        print(f"Error in web_research: {str(e)}")
+        return {"search_results": []}
+
+# document analysis prompt
+document_prompt = ChatPromptTemplate.from_template("""
+You are a research assistant analyzing excerpts from uploaded documents.
+
+Research query: {query}
+
+Document excerpts:
+{pdf_context}
+
+Please extract the findings from these excerpts that are relevant to the query:
+1. Keep specific facts, figures, definitions and conclusions intact
+2. Note which document or section each finding comes from where this is clear
+3. Leave out material that is unrelated to the query
+
+Present the findings as a well-organized summary.
+""")
 
-        # Summarize the search results
-        research_output = summarize_search_results(state["optimized_query"], search_results)
+async def document_research(state: ResearchState) -> ResearchState:
+    # Nothing to analyze unless PDFs were attached to the research
+    if not (state.get("pdf_context") and state["pdf_context"].strip()):
+        return {"document_findings": ""}
 
-        # If PDF context is available, enhance the research with PDF content
-        if state.get("pdf_context") and state["pdf_context"].strip():
-            print("Enhancing research with PDF context...")
+    print("Analyzing PDF context...")
 
-            enhancement_prompt = ChatPromptTemplate.from_template("""
-            You are a research assistant combining web research with document analysis.
+    try:
+        document_findings = await cached_ainvoke(document_prompt, research_llm, str_parser, {
+            "query": state["optimized_query"],
+            "pdf_context": state["pdf_context"]
+        })
+        return {"document_findings": document_findings}
+    except Exception as e:
+        print(f"Error in document_research: {str(e)}")
+        # Fall back to the raw excerpts so the documents still reach the research output
+        return {"document_findings": state["pdf_context"]}
+
+# prompt combining web search results with document findings
+enhancement_prompt = ChatPromptTemplate.from_template("""
+You are a research assistant combining web research with document analysis.
+
+Original query: {query}
 
-            Original query: {query}
+Web search results:
+{web_research}
 
-            Web research findings:
-            {web_research}
+Findings from uploaded documents:
+{document_findings}
 
-            Additional context from uploaded documents:
-            {pdf_context}
+Please provide a comprehensive research output that:
+1. Integrates insights from both web research and document context
+2. Highlights how the document context supports or contradicts web findings
+3. Provides a more complete picture by combining both sources
+4. Maintains accuracy and cites sources appropriately
+
+Your response should be thorough, well-organized, and clearly indicate when information comes from the uploaded documents vs. web sources.
+""")
+
+async def combine_research(state: ResearchState) -> ResearchState:
+    try:
+        search_results = state.get("search_results", [])
 
-            Please provide a comprehensive research output that:
-            1. Integrates insights from both web research and document context
-            2. Highlights how the document context supports or contradicts web findings
-            3. Provides a more complete picture by combining both sources
-            4. Maintains accuracy and cites sources appropriately
+        # Without document findings this is a plain summary of the web search
+        if not state.get("document_findings"):
+            return {"research_output": await summarize_search_results(state["optimized_query"], search_results)}
 
-            Your response should be thorough, well-organized, and clearly indicate when information comes from the uploaded documents vs. web sources.
-            """)
+        print("Enhancing research with PDF context...")
 
-            chain = enhancement_prompt | research_llm | StrOutputParser()
-            enhanced_output = chain.invoke({
-                "query": state["optimized_query"],
-                "web_research": research_output,
-                "pdf_context": state["pdf_context"]
-            })
+        formatted_results = format_search_results(search_results)
 
-            return {"research_output": enhanced_output}
-        else:
-            return {"research_output": research_output}
+        enhanced_output = await cached_ainvoke(enhancement_prompt, research_llm, str_parser, {
+            "query": state["optimized_query"],
+            "web_research": formatted_results,
+            "document_findings": state["document_findings"]
+        })
+
+        return {"research_output": enhanced_output}
 
     except Exception as e:
-        print(f"Error in conduct_research: {str(e)}")
+        print(f"Error in combine_research: {str(e)}")
         # Return a placeholder research output to allow the workflow to continue
         return {"research_output": f"Research could not be completed due to an error: {str(e)}"}
-def extract_key_claims(state: ResearchState) -> ResearchState:
-    print("Extracting key claims from research output...")
-    claims = extract_claims(state["research_output"])
-    return {"claims": claims}
 
-def verify_claims(state: ResearchState) -> ResearchState:
-    print("Verifying claims against trusted sources...")
-    verification_results = []
-
-    for claim_item in state["claims"]:
-        claim = claim_item.get("claim")
-        importance = claim_item.get("importance")
+async def extract_claims_and_search(research_output):
+    claims = []
+    searches = []
+    try:
+        async for claim_item in stream_claims(research_output):
+            claims.append(claim_item)
+            # Start searching for evidence on this claim while later claims are still being extracted
+            searches.append(asyncio.create_task(search_claim_async(claim_item.get("claim"))))
+    except Exception as e:
+        print(f"Error in extract_claims: {str(e)}")
+        if not claims:
+            claims = [{"claim": f"Error extracting claims: {str(e)}", "importance": "low"}]
+            searches = [asyncio.create_task(search_claim_async(claims[0]["claim"]))]
 
-        # Verify the claim
-        verification = verify_claim(claim)
+    verification_data = await asyncio.gather(*searches)
+    return claims, list(verification_data)
 
-        # Store the verification data for reference extraction
-        search_results = fact_verification_search.invoke(claim)
-        verification_data = "\n\n".join([
-            f"Source: {result.get('url', 'Unknown')}\n"
-            f"Title: {result.get('title', 'No title')}\n"
-            f"Content: {result.get('content', 'No content')}"
-            for result in search_results
-        ])
+async def extract_key_claims(state: ResearchState) -> ResearchState:
+    print("Extracting key claims from research output...")
+    claims, claim_evidence = await extract_claims_and_search(state["research_output"])
+    return {"claims": claims, "claim_evidence": claim_evidence}
+
+async def verify_all_claims(claim_items, verification_data=None):
+    claims = [claim_item.get("claim") for claim_item in claim_items]
+
+    # Claims are independent, so search for any that weren't searched during extraction all at once
+    if verification_data is None or len(verification_data) != len(claims):
+        verification_data = await asyncio.gather(*(search_claim_async(claim) for claim in claims))
+
+    # Then assess them a batch at a time rather than with one LLM call per claim
+    batches = [
+        range(start, min(start + VERIFY_BATCH_SIZE, len(claims)))
+        for start in range(0, len(claims), VERIFY_BATCH_SIZE)
+    ]
+    batch_results = await asyncio.gather(*(
+        verify_claim_batch_async([claims[i] for i in batch], [verification_data[i] for i in batch])
+        for batch in batches
+    ))
 
-        verification["claim"] = claim
-        verification["importance"] = importance
-        verification["verification_data"] = verification_data
-        verification_results.append(verification)
+    verification_results = []
+    for batch, assessments in zip(batches, batch_results):
+        for i, verification in zip(batch, assessments):
+            verification["claim"] = claims[i]
+            verification["importance"] = claim_items[i].get("importance")
+            verification_results.append(verification)
+    return verification_results, list(verification_data)
+
+async def verify_claims(state: ResearchState) -> ResearchState:
+    print("Verifying claims against trusted sources...")
+    verification_results, claim_evidence = await verify_all_claims(state["claims"], state.get("claim_evidence"))
 
-    # Extract references from verification data
-    references = extract_references(verification_results)
+    # The search results stay in claim_evidence, apart from the verification results, and are
+    # only read here to extract references
+    references = extract_references(claim_evidence)
 
     return {
         "verification_results": verification_results,
+        "claim_evidence": claim_evidence,
         "references": references
     }
 
-def generate_fact_check_report(state: ResearchState) -> ResearchState:
-    print("Generating fact-check report...")
-
-    # Clean verification results for the prompt by removing verification_data
-    clean_verification_results = []
-    for v in state["verification_results"]:
-        v_clean = v.copy()
-        if "verification_data" in v_clean:
-            del v_clean["verification_data"]
-        clean_verification_results.append(v_clean)
+# fact-check report prompt
+overall_report_prompt = ChatPromptTemplate.from_template("""
+You are a critical fact-checker generating a comprehensive verification report.
 
-    overall_report_prompt = ChatPromptTemplate.from_template("""
-    You are a critical fact-checker generating a comprehensive verification report.
+Original research output:
+{research_output}
 
-    Original research output:
-    {research_output}
+Detailed verification results for key claims:
+{verification_results}
 
-    Detailed verification results for key claims:
-    {verification_results}
+References used in verification:
+{references}
 
-    References used in verification:
-    {references}
+Please provide a comprehensive fact-check report that:
+1. Summarizes the overall reliability of the research (with an overall score from 0-10)
+2. Highlights the most significant accuracy issues
+3. Provides context for any misleading or incomplete information
+4. Suggests improvements to make the research more accurate and balanced
+5. Includes a properly formatted "References" section at the end listing all sources used in verification
 
-    Please provide a comprehensive fact-check report that:
-    1. Summarizes the overall reliability of the research (with an overall score from 0-10)
-    2. Highlights the most significant accuracy issues
-    3. Provides context for any misleading or incomplete information
-    4. Suggests improvements to make the research more accurate and balanced
-    5. Includes a properly formatted "References" section at the end listing all sources used in verification
+Your report should be detailed, fair, and constructive. Make sure to cite specific references by number when discussing claims.
+""")
 
-    Your report should be detailed, fair, and constructive. Make sure to cite specific references by number when discussing claims.
-    """)
+async def generate_fact_check_report(state: ResearchState) -> ResearchState:
+    print("Generating fact-check report...")
 
-    chain = overall_report_prompt | fact_checker_llm | StrOutputParser()
-    fact_check_report = chain.invoke({
+    fact_check_report = await cached_ainvoke(overall_report_prompt, fact_checker_llm, str_parser, {
         "research_output": state["research_output"],
-        "verification_results": json.dumps(clean_verification_results, indent=2),
+        "verification_results": orjson.dumps(state["verification_results"], option=orjson.OPT_INDENT_2).decode(),
         "references": "\n".join(state["references"])
     })
 
     return {"fact_check_report": fact_check_report}
 
-def create_draft_content(state: ResearchState) -> ResearchState:
-    print(f"Drafting content in {state['content_style']} style...")
+# draft prompt; the body only needs the research and the claim verdicts, so it is written while
+# the fact-check report is still being generated
+draft_prompt = ChatPromptTemplate.from_template("""
+Based on the following research results, create a {style} content where you will draft info only about the query {optimized_query} and the research findings. Not about the process like fact checking query optimization just use the Research findings:
+{research}
+
+Where the draft covers any of these fact-checked claims, use the corrected version:
+{verified_claims}
+
+Cite these References by number where you use them:
+{references}
+Do not add a references list at the end of the draft, it is added separately.
+The content should be informative, engaging, and suitable for the target audience.
+
+Please structure the draft in a clear, engaging {style} format.
+Do not include any <think> or </think> tags in your response.
+""")
+
+# accuracy notes prompt, for the closing section written once the fact-check report is ready
+accuracy_notes_prompt = ChatPromptTemplate.from_template("""
+You are finishing a {style} about {optimized_query}. Based on the following Fact-check report:
+{fact_check}
+
+Write a short closing section titled "Accuracy Notes" that tells readers which points are well supported,
+which are uncertain or disputed, and any context they should keep in mind. Match the tone of a {style}
+and do not describe the fact-checking process itself.
+Do not include any <think> or </think> tags in your response.
+""")
 
-    draft_prompt = ChatPromptTemplate.from_template("""
-    Based on the following research results, create a {style} content where you will draft info only about the query {optimized_query} and the research findings. Not about the process like fact checking query optimization just use the Research findings:
-    {research} and Fact-check report:
-    {fact_check} to generate this {style} based draft having the References:
-    {references} at the end of the draft
-    The content should be informative, engaging, and suitable for the target audience.
+async def generate_without_think(prompt, llm, inputs):
+    # Stream the response so any reasoning is dropped as it arrives instead of being kept and cut out afterwards
+    return "".join([piece async for piece in strip_think_stream(cached_astream(prompt, llm, inputs))])
 
-    Please structure the draft in a clear, engaging {style} format.
-    Do not include any <think> or </think> tags in your response.
-    """)
+# The draft prompt with each known style already filled in
+style_draft_prompts = {style: draft_prompt.partial(style=style) for style in STYLE_PROMPTS}
 
-    chain = draft_prompt | research_llm | StrOutputParser()
-    draft_content = chain.invoke({
+async def create_draft_body(state: ResearchState) -> ResearchState:
+    style = state["content_style"]
+    print(f"Drafting content in {style} style...")
+
+    verified_claims = "\n".join(
+        f"- {v.get('corrected_claim') or v.get('claim')} (accuracy {v.get('accuracy_score', '?')}/10)"
+        for v in state["verification_results"]
+    )
+
+    prompt = style_draft_prompts.get(style) or draft_prompt.partial(style=style)
+    draft_body = await generate_without_think(prompt, research_llm, {
         "optimized_query": state["optimized_query"],
         "research": state["research_output"],
-        "fact_check": state["fact_check_report"],
-        "style": state["content_style"],
+        "verified_claims": verified_claims,
         "references": "\n".join(state["references"])
     })
-    draft_content = re.sub(r'<think>.*?</think>', '', draft_content, flags=re.DOTALL)
+
+    return {"draft_body": draft_body}
+
+async def create_draft_content(state: ResearchState) -> ResearchState:
+    print("Adding accuracy notes to the draft...")
+
+    accuracy_notes = await generate_without_think(accuracy_notes_prompt, research_llm, {
+        "optimized_query": state["optimized_query"],
+        "fact_check": state["fact_check_report"],
+        "style": state["content_style"]
+    })
+
+    sections = [state["draft_body"], accuracy_notes]
+    if state["references"]:
+        sections.append("References:\n" + "\n".join(state["references"]))
 
     return {
-        "draft_content": draft_content,
+        "draft_content": "\n\n".join(section.strip() for section in sections if section.strip()),
         "status": "completed"
     }
 
@@ -445,22 +915,32 @@ def create_research_workflow():
 
     # Add nodes
     workflow.add_node("optimize_query", optimize_query)
-    workflow.add_node("conduct_research", conduct_research)
+    workflow.add_node("web_research", web_research)
+    workflow.add_node("document_research", document_research)
+    workflow.add_node("combine_research", combine_research)
     workflow.add_node("extract_key_claims", extract_key_claims)
     workflow.add_node("verify_claims", verify_claims)
     workflow.add_node("generate_fact_check_report", generate_fact_check_report)
+    workflow.add_node("create_draft_body", create_draft_body)
     workflow.add_node("create_draft_content", create_draft_content)
 
     # Define edges
     workflow.set_entry_point("optimize_query")
-    workflow.add_edge("optimize_query", "conduct_research")
-    workflow.add_edge("conduct_research", "extract_key_claims")
+    workflow.add_edge("optimize_query", "web_research")
+    workflow.add_edge("optimize_query", "document_research")
+    workflow.add_edge(["web_research", "document_research"], "combine_research")
+    workflow.add_edge("combine_research", "extract_key_claims")
     workflow.add_edge("extract_key_claims", "verify_claims")
     workflow.add_edge("verify_claims", "generate_fact_check_report")
-    workflow.add_edge("generate_fact_check_report", "create_draft_content")
+    workflow.add_edge("verify_claims", "create_draft_body")
+    workflow.add_edge(["generate_fact_check_report", "create_draft_body"], "create_draft_content")
     workflow.add_edge("create_draft_content", END)
 
     return workflow.compile()
+
+# The compiled graph holds no per-run state, so it is built once and shared by every request
+research_workflow = create_research_workflow()
+
 # Main research flow function using LangGraph
 def conduct_research_workflow(query: str, content_style: str, pdf_context: str = "") -> Dict[str, Any]:
     """
@@ -477,23 +957,33 @@ def conduct_research_workflow(query: str, content_style: str, pdf_context: str =
     print(f"Starting research workflow on query: {query}")
 
     try:
-        workflow = create_research_workflow()
-
         initial_state = {
             "query": query,
             "optimized_query": "",
             "pdf_context": pdf_context,
+            "search_results": [],
+            "document_findings": "",
             "research_output": "",
             "claims": [],
+            "claim_evidence": [],
             "verification_results": [],
             "references": [],
             "fact_check_report": "",
             "content_style": content_style,
+            "draft_body": "",
             "draft_content": "",
             "status": "in_progress"
         }
 
-        result = workflow.invoke(initial_state)
+        # The nodes are async, so hand the run to the shared event loop and wait for it
+        result = run_async(research_workflow.ainvoke(initial_state))
+
+        # The raw search results, document findings, claim evidence and draft body are only
+        # needed between nodes
+        result.pop("search_results", None)
+        result.pop("document_findings", None)
+        result.pop("claim_evidence", None)
+        result.pop("draft_body", None)
 
         return result
     except Exception as e:
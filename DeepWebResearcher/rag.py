@@ -8,7 +8,18 @@ from mistralai import Mistral
 from langchain_core.embeddings import Embeddings
 from langchain_community.vectorstores import Qdrant as QdrantVectorStore
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
+from qdrant_client.models import (
+    Distance,
+    HnswConfigDiff,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+)
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+from rate_limits import is_rate_limited
 
 # Load environment variables from .env file
 from dotenv import load_dotenv
@@ -19,6 +30,18 @@ MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 QDRANT_URL = os.getenv("QDRANT_URL")
 HUGGINGFACEHUB_API_TOKEN = os.getenv("HUGGINGFACEHUB_API_TOKEN")
 
+# Index settings for new collections: a moderate HNSW graph plus int8 vectors kept in RAM
+HNSW_CONFIG = HnswConfigDiff(m=16, ef_construct=128)
+QUANTIZATION_CONFIG = ScalarQuantization(
+    scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+)
+# Approximate search over the quantized vectors, rescored with the originals for the top hits
+SEARCH_PARAMS = SearchParams(
+    hnsw_ef=int(os.getenv("QDRANT_HNSW_EF", "64")),
+    exact=False,
+    quantization=QuantizationSearchParams(rescore=True)
+)
+
 class MistralEmbeddings(Embeddings):
         def __init__(self, api_key: str, model: str = "mistral-embed", target_dim: int = 1536):
             self.client = Mistral(api_key=api_key)
@@ -31,18 +54,25 @@ class MistralEmbeddings(Embeddings):
             else:
                 return embedding + [0.0] * (self.target_dim - len(embedding))
 
-        def embed_documents(self, texts: List[str]) -> List[List[float]]:
-            embeddings_response = self.client.embeddings.create(
+        @retry(
+            retry=retry_if_exception(is_rate_limited),
+            wait=wait_exponential(multiplier=1, max=30),
+            stop=stop_after_attempt(5),
+            reraise=True
+        )
+        def _create_embeddings(self, inputs: List[str]):
+            """Embed a batch of texts in one request, backing off while rate limited"""
+            return self.client.embeddings.create(
                 model=self.model,
-                inputs=texts,
+                inputs=inputs,
             )
+
+        def embed_documents(self, texts: List[str]) -> List[List[float]]:
+            embeddings_response = self._create_embeddings(texts)
             return [self._pad_embedding(data.embedding) for data in embeddings_response.data]
 
         def embed_query(self, text: str) -> List[float]:
-            embeddings_response = self.client.embeddings.create(
-                model=self.model,
-                inputs=[text],
-            )
+            embeddings_response = self._create_embeddings([text])
             return self._pad_embedding(embeddings_response.data[0].embedding)
 
 class RAGPipeline:
@@ -68,11 +98,16 @@ class RAGPipeline:
             if self.collection_name not in collection_names:
                 self.client.create_collection(
                     collection_name=self.collection_name,
-                    vectors_config=VectorParams(size=self.vector_size, distance=Distance.COSINE)
+                    vectors_config=VectorParams(size=self.vector_size, distance=Distance.COSINE),
+                    hnsw_config=HNSW_CONFIG,
+                    quantization_config=QUANTIZATION_CONFIG
                 )
 
-        def process_pdf(self, pdf_path: str, metadata: Optional[dict] = None):
-            """Process a PDF file and add it to the vector store with optional metadata"""
+        def process_pdf(self, pdf_path: str, metadata: Optional[dict] = None, batch_size: int = 32):
+            """
+            Process a PDF file and add it to the vector store with optional metadata.
+            Chunks are embedded and upserted batch_size at a time, one request per batch.
+            """
             print(f"Processing PDF: {pdf_path}")
             loader = PyPDFLoader(pdf_path)
             documents = loader.load()
@@ -89,13 +124,13 @@ class RAGPipeline:
             texts = text_splitter.split_documents(documents)
 
             # Store the documents in the vector store
-            self.vector_store.add_documents(texts)
+            self.vector_store.add_documents(texts, batch_size=batch_size)
             print(f"Added {len(texts)} chunks from PDF to vector store")
             return len(texts)
 
         def query(self, query_text: str, top_k: int = 5) -> dict:
             """Query the vector store and return both the answer and retrieved documents"""
-            retriever = self.vector_store.as_retriever(search_kwargs={"k": top_k})
+            retriever = self.vector_store.as_retriever(search_kwargs={"k": top_k, "search_params": SEARCH_PARAMS})
 
             # Get the raw documents for context enhancement
             retrieved_docs = retriever.get_relevant_documents(query_text)
@@ -123,7 +158,7 @@ class RAGPipeline:
 
         def get_relevant_context(self, query_text: str, top_k: int = 5) -> str:
             """Get relevant context from the vector store without generating an answer"""
-            retriever = self.vector_store.as_retriever(search_kwargs={"k": top_k})
+            retriever = self.vector_store.as_retriever(search_kwargs={"k": top_k, "search_params": SEARCH_PARAMS})
             retrieved_docs = retriever.get_relevant_documents(query_text)
 
             # Combine the content from retrieved documents
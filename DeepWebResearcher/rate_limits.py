@@ -0,0 +1,9 @@
+def is_rate_limited(error: BaseException) -> bool:
+    """
+    True if an API error is an HTTP 429. Clients report the status in different
+    places: Groq and Mistral errors carry status_code, aiohttp errors carry status,
+    and requests/httpx errors carry it on the wrapped response.
+    """
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    response = getattr(error, "response", None)
+    return 429 in (status, getattr(response, "status_code", None))
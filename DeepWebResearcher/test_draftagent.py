@@ -0,0 +1,61 @@
+import asyncio
+import os
+import unittest
+
+# draftagent builds its clients at import time, so give them keys before importing it
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
+
+import tenacity
+
+import draftagent
+
+
+class FakeSearch:
+    """Stands in for TavilySearchResults, returning the queued results in order"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    async def ainvoke(self, query):
+        self.calls += 1
+        return self.results.pop(0)
+
+
+class SearchClaimTest(unittest.TestCase):
+    def setUp(self):
+        self._search = draftagent.fact_verification_search
+        self._wait = draftagent.search_with_retry.retry.wait
+        draftagent.search_with_retry.retry.wait = tenacity.wait_none()
+
+    def tearDown(self):
+        draftagent.fact_verification_search = self._search
+        draftagent.search_with_retry.retry.wait = self._wait
+
+    def search(self, claim, *results):
+        draftagent.fact_verification_search = FakeSearch(*results)
+        return asyncio.run(draftagent.search_claim_async(claim))
+
+    def test_error_string_gives_empty_evidence_and_is_not_cached(self):
+        claim = "An error string is not evidence"
+        self.assertEqual(self.search(claim, "HTTPError('500 Server Error')"), "")
+        self.assertIsNone(draftagent._search_cache.get(claim.lower()))
+
+    def test_rate_limit_string_is_retried(self):
+        claim = "A rate limited search is retried"
+        evidence = self.search(
+            claim,
+            "Exception('Error 429: Too Many Requests')",
+            [{"url": "https://example.com", "title": "Example", "content": "Evidence"}]
+        )
+        self.assertEqual(draftagent.fact_verification_search.calls, 2)
+        self.assertIn("Source: https://example.com", evidence)
+
+    def test_rate_limit_that_persists_gives_empty_evidence(self):
+        attempts = draftagent.search_with_retry.retry.stop.max_attempt_number
+        self.assertEqual(self.search("Still rate limited", *["Error 429"] * attempts), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,7 @@
 
 const API_BASE_URL = 'http://127.0.0.1:5000'; // Updated to match the port in app.py
 
-import { PDFDocument, PDFUploadResponse, PDFLibraryResponse } from '../src/types';
+import { PDFDocument, PDFUploadResponse, PDFLibraryResponse, PDFStatusResponse } from '../src/types';
 
 export interface ResearchResponse {
   research_id: string;
@@ -240,6 +240,43 @@ export const uploadPDF = async (
   }
 };
 
+// Get the indexing status of an uploaded PDF
+export const getPDFStatus = async (pdfId: string): Promise<PDFStatusResponse> => {
+  try {
+    const response = await fetch(`${API_BASE_URL}/pdfs/${pdfId}/status`);
+
+    if (!response.ok) {
+      const errorData = await response.json();
+      throw new Error(errorData.error || 'Failed to get PDF status');
+    }
+
+    return await response.json();
+  } catch (error) {
+    console.error('Error getting PDF status:', error);
+    throw error;
+  }
+};
+
+// Poll an uploaded PDF until indexing has finished, one way or the other.
+// Research can only use a PDF once its status is 'ready'
+export const waitForPDFIndexing = async (
+  pdfId: string,
+  intervalMs: number = 2000,
+  timeoutMs: number = 10 * 60 * 1000
+): Promise<PDFStatusResponse> => {
+  const deadline = Date.now() + timeoutMs;
+  while (true) {
+    const pdfStatus = await getPDFStatus(pdfId);
+    if (pdfStatus.status !== 'processing') {
+      return pdfStatus;
+    }
+    if (Date.now() >= deadline) {
+      throw new Error('Timed out waiting for the PDF to be indexed');
+    }
+    await new Promise(resolve => setTimeout(resolve, intervalMs));
+  }
+};
+
 // Get all PDFs
 export const getAllPDFs = async (tag?: string): Promise<PDFLibraryResponse> => {
   try {
@@ -22,7 +22,7 @@ import {
   AlertDialogTitle,
 } from "@/components/ui/alert-dialog";
 import { PDFLibrary } from './PDFLibrary';
-import { uploadPDF } from '../../services/api';
+import { uploadPDF, waitForPDFIndexing } from '../../services/api';
 import { toast } from './ui/use-toast';
 
 interface SearchCategory {
@@ -263,12 +263,24 @@ export const SearchHub = ({ onSubmit, isLoading = false }: SearchHubProps) => {
       try {
         setUploading(true);
         const response = await uploadPDF(file, file.name.replace('.pdf', ''));
-        setSelectedPDFs(prev => [...prev, response.pdf_id]);
         setUploadedPdf(file);
-        toast({
-          title: "Success",
-          description: "PDF uploaded and ready for research",
-        });
+
+        // The upload returns before the PDF is indexed; only offer it to research once it's ready
+        const pdfStatus = await waitForPDFIndexing(response.pdf_id);
+        if (pdfStatus.status === 'ready') {
+          setSelectedPDFs(prev => [...prev, response.pdf_id]);
+          toast({
+            title: "Success",
+            description: "PDF uploaded and ready for research",
+          });
+        } else {
+          setUploadedPdf(null);
+          toast({
+            title: "Indexing Error",
+            description: pdfStatus.error || "The PDF was uploaded but could not be indexed for research",
+            variant: "destructive"
+          });
+        }
       } catch (error) {
         console.error('Error uploading PDF:', error);
         toast({
@@ -406,7 +418,7 @@ export const SearchHub = ({ onSubmit, isLoading = false }: SearchHubProps) => {
                   disabled={uploading}
                 >
                   <Upload size={16} />
-                  {uploading ? 'Uploading...' : 'Upload PDF'}
+                  {uploading ? 'Uploading and indexing...' : 'Upload PDF'}
                 </Button>
 
                 <Button
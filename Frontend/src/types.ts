@@ -30,6 +30,13 @@ export interface PDFUploadResponse {
   chunk_count?: number;
 }
 
+export interface PDFStatusResponse {
+  pdf_id: string;
+  status: 'processing' | 'ready' | 'failed' | 'not_indexed';
+  chunk_count?: number | null;
+  error?: string | null;
+}
+
 export interface PDFLibraryResponse {
   count: number;
   pdfs: PDFDocument[];